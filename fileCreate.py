@@ -30,8 +30,9 @@ file_dict = {
 }
 
 
-def generate_file():
-    base_path = os.path.join(os.getcwd(), "mmd")
+def generate_file(base_path=None):
+    if base_path is None:
+        base_path = os.path.join(os.getcwd(), "mmd")
     print(base_path)
     for e in file_dict:
         temp = os.path.join(base_path, e)
@@ -0,0 +1,160 @@
+"""
+重复卡片检测
+只对 IEND 之后的卡片数据计算哈希，人物卡再跳过内嵌的头像图片，换了封面图重新保存的同一张卡也能识别为重复。
+哈希结果按 路径+大小+修改时间 缓存，重复运行只计算新卡片。
+
+python kk_card_dedupe.py 卡片目录
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from kk_clothes_pares import CHARA_CHECK_KEY, CHECK_KEY, seek_png_end
+from kk_file_walker import iter_files
+from kk_scene_pares import is_scene_header
+from logger_handler import get_logger
+
+logger = get_logger()
+
+HASH_CACHE_FILE_NAME = "kk_card_hash_cache.json"
+READ_SIZE = 1024 * 1024
+HEADER_SIZE = 32  # 与 detect_card_type 读取的长度相同
+
+
+def _read_length_bytes(f, length_format):
+    length_size = struct.calcsize(length_format)
+    raw = f.read(length_size)
+    if len(raw) < length_size:
+        return None
+    return f.read(struct.unpack("<" + length_format, raw)[0])
+
+
+# IEND 之后的数据是否以人物卡、服装卡或场景卡的标识开头，判断方式与 detect_card_type 相同
+def _is_card_header(header):
+    return CHECK_KEY in header or CHARA_CHECK_KEY in header or is_scene_header(header)
+
+
+# 计算卡片数据哈希，不是恋活卡片时返回None
+def hash_card_data(card_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(card_path, 'rb') as f:
+        if not seek_png_end(f):
+            return None
+        start = f.tell()
+        # 普通png（IEND之后没有数据或不是卡片数据）不参与比较，否则所有普通图片都会被当作重复
+        if not _is_card_header(f.read(HEADER_SIZE)):
+            return None
+        f.seek(start)
+        # 人物卡：productNo, 【KoiKatuChara】, 版本号, 头像png, 之后才是角色数据
+        product_no = f.read(4)
+        marker = _read_length_bytes(f, "B")
+        if len(product_no) == 4 and marker and CHARA_CHECK_KEY in marker:
+            version = _read_length_bytes(f, "B")
+            face_length = f.read(4)
+            if version is None or len(face_length) < 4:
+                return None
+            face_length = struct.unpack("<i", face_length)[0]
+            if face_length < 0:
+                return None
+            f.seek(face_length, 1)
+            digest.update(marker)
+        else:
+            f.seek(start)
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_hash_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.info("卡片哈希缓存读取失败，将重新计算：%s", e)
+        return {}
+
+
+def _hash_card_safe(card_path):
+    try:
+        return hash_card_data(card_path)
+    except OSError as e:
+        logger.info("卡片读取失败 %s: %s", card_path, e)
+        return None
+
+
+def find_duplicate_cards(folder_path, cache_path=None, workers=None):
+    """
+    查找重复卡片
+
+    Args:
+        folder_path: 卡片目录
+        cache_path: 哈希缓存文件，默认当前目录下的 kk_card_hash_cache.json
+        workers: 计算哈希的线程数
+
+    Returns:
+        list: 重复卡片分组，每组为路径列表
+    """
+    if cache_path is None:
+        cache_path = os.path.join(os.getcwd(), HASH_CACHE_FILE_NAME)
+    old_cache = load_hash_cache(cache_path)
+    cache = {}
+    new_cards = []
+    for entry, _ in iter_files(folder_path, ('.png',)):
+        card_path = entry.path
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.info("卡片读取失败 %s: %s", card_path, e)
+            continue
+        record = old_cache.get(card_path)
+        if record and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+            cache[card_path] = record
+        else:
+            new_cards.append((card_path, stat))
+    logger.info("共%s张卡片，需计算哈希%s张", len(cache) + len(new_cards), len(new_cards))
+
+    # 哈希计算时释放GIL，线程池即可并行
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (card_path, stat), card_hash in zip(new_cards,
+                                               executor.map(_hash_card_safe, [p for p, _ in new_cards])):
+            cache[card_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": card_hash}
+
+    # 保留其他目录的缓存记录
+    folder_prefix = os.path.join(folder_path, "")
+    saved_cache = {p: r for p, r in old_cache.items() if not p.startswith(folder_prefix)}
+    saved_cache.update(cache)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(saved_cache, f, ensure_ascii=False, indent=4)
+
+    groups = {}
+    for card_path, record in cache.items():
+        if record['hash']:
+            groups.setdefault(record['hash'], []).append(card_path)
+    duplicate_groups = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+    logger.info("发现重复卡片%s组", len(duplicate_groups))
+    return duplicate_groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查找重复的恋活卡片")
+    parser.add_argument("folder", help="卡片目录")
+    parser.add_argument("--cache", default=None, help="哈希缓存文件路径")
+    parser.add_argument("--workers", type=int, default=None, help="线程数")
+    args = parser.parse_args()
+    for group in find_duplicate_cards(args.folder, args.cache, args.workers):
+        print("重复卡片:")
+        for card_path in group:
+            print(f"    {card_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import os
+
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, Signal
+from PySide6.QtWidgets import (QAbstractItemView, QDialog, QHeaderView, QLabel, QTableWidget,
+                               QTableWidgetItem, QVBoxLayout)
+
+from kk_file_walker import iter_files
+from kk_thumbnail_cache import THUMBNAIL_SIZE, ThumbnailCache
+
+VISIBLE_ROW_MARGIN = 50  # 可见区域外保留缩略图的行数
+
+
+def list_card_files(folder_path):
+    """递归列出文件夹下的png卡片"""
+    return sorted(entry.path for entry, _ in iter_files(folder_path, ('.png',)))
+
+
+class _CardListSignals(QObject):
+    finished = Signal(list)
+
+
+class _CardListTask(QRunnable):
+    """后台扫描卡片文件夹，卡片很多时不阻塞界面"""
+
+    def __init__(self, folder_path, signals):
+        super().__init__()
+        self.folder_path = folder_path
+        self.signals = signals
+
+    def run(self):
+        self.signals.finished.emit(list_card_files(self.folder_path))
+
+
+class CardLibraryDialog(QDialog):
+    """卡片库预览，只为可见行加载缩略图，双击行解析该卡片"""
+
+    def __init__(self, folder_path, on_card_selected, parent=None):
+        super().__init__(parent)
+        self.on_card_selected = on_card_selected
+        self.folder_path = folder_path
+        self.card_files = []
+        self.row_by_path = {}
+        self.thumbnail_rows = set()
+        self.thumbnail_cache = ThumbnailCache(parent=self)
+        self.thumbnail_cache.thumbnail_ready.connect(self.set_thumbnail)
+        # 滚动停止后再加载，避免快速滚动时排队大量任务
+        self.load_timer = QTimer(self)
+        self.load_timer.setSingleShot(True)
+        self.load_timer.setInterval(50)
+        self.load_timer.timeout.connect(self.load_visible_thumbnails)
+        self.init_ui()
+        # 信号对象不挂在对话框上，对话框先关闭时后台任务仍可安全发出信号
+        self.list_signals = _CardListSignals()
+        self.list_signals.finished.connect(self.set_card_files)
+        QThreadPool.globalInstance().start(_CardListTask(folder_path, self.list_signals))
+
+    def init_ui(self):
+        self.setWindowTitle('卡片库预览')
+        self.setGeometry(150, 150, 700, 600)
+        layout = QVBoxLayout(self)
+        self.label_info = QLabel(f'卡片文件夹: {self.folder_path}  正在扫描...')
+        layout.addWidget(self.label_info)
+
+        self.table_widget = QTableWidget(0, 3)
+        self.table_widget.setHorizontalHeaderLabels(['预览', '卡片名称', '卡片路径'])
+        self.table_widget.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_widget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_widget.setIconSize(THUMBNAIL_SIZE)
+        self.table_widget.verticalHeader().setDefaultSectionSize(THUMBNAIL_SIZE.height() + 6)
+        header = self.table_widget.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.Fixed)
+        header.resizeSection(0, THUMBNAIL_SIZE.width() + 12)
+        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table_widget.verticalScrollBar().valueChanged.connect(self.schedule_load)
+        self.table_widget.cellDoubleClicked.connect(self.select_card)
+        layout.addWidget(self.table_widget)
+
+    def set_card_files(self, card_files):
+        """扫描完成后填充表格"""
+        self.card_files = card_files
+        self.row_by_path = {path: row for row, path in enumerate(card_files)}
+        self.label_info.setText(f'卡片文件夹: {self.folder_path}  共{len(card_files)}张（双击解析）')
+        self.table_widget.setRowCount(len(card_files))
+        for row, card_path in enumerate(card_files):
+            self.table_widget.setItem(row, 0, QTableWidgetItem())
+            self.table_widget.setItem(row, 1, QTableWidgetItem(os.path.splitext(os.path.basename(card_path))[0]))
+            self.table_widget.setItem(row, 2, QTableWidgetItem(card_path))
+        self.schedule_load()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.schedule_load()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_load()
+
+    def schedule_load(self):
+        self.load_timer.start()
+
+    def load_visible_thumbnails(self):
+        if not self.card_files:
+            return
+        viewport = self.table_widget.viewport()
+        first_row = max(self.table_widget.rowAt(0), 0)
+        last_row = self.table_widget.rowAt(viewport.height() - 1)
+        if last_row < 0:
+            last_row = len(self.card_files) - 1
+        self.thumbnail_cache.cancel_pending()
+        # 释放远离可见区域的缩略图，表格占用的内存不随卡片数量增长
+        keep_rows = range(first_row - VISIBLE_ROW_MARGIN, last_row + VISIBLE_ROW_MARGIN + 1)
+        for row in [r for r in self.thumbnail_rows if r not in keep_rows]:
+            self.table_widget.item(row, 0).setData(Qt.DecorationRole, None)
+            self.thumbnail_rows.discard(row)
+        for row in range(first_row, last_row + 1):
+            pixmap = self.thumbnail_cache.request(self.card_files[row])
+            if pixmap is not None:
+                self.table_widget.item(row, 0).setData(Qt.DecorationRole, pixmap)
+                self.thumbnail_rows.add(row)
+
+    def set_thumbnail(self, card_path, pixmap):
+        row = self.row_by_path.get(card_path)
+        if row is not None:
+            self.table_widget.item(row, 0).setData(Qt.DecorationRole, pixmap)
+            self.thumbnail_rows.add(row)
+
+    def select_card(self, row, column):
+        self.on_card_selected(self.card_files[row])
+
+    def closeEvent(self, event):
+        self.thumbnail_cache.cancel_pending()
+        super().closeEvent(event)
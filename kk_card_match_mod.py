@@ -1,3 +1,4 @@
+import fnmatch
 import json
 import os
 import zipfile
@@ -6,7 +7,9 @@ from pathlib import Path
 from xml.etree import ElementTree as ET
 from kkloader import KoikatuCharaData
 from logger_handler import get_logger
-from kk_clothes_pares import KKClothData
+from kk_file_walker import iter_files
+from kk_clothes_pares import KKClothData, CHECK_KEY, CHARA_CHECK_KEY, seek_png_end
+from kk_scene_pares import KKSceneData, is_scene_header
 
 logger = get_logger()
 
@@ -15,11 +18,32 @@ MOD_REPOSITORY_PATH = "D:\\ForCharactersLoading"
 GAME_MOD_JSON_PATH = "D:\\ForCharactersLoading\\kk_mod.json"
 GAME_MOD_PATH = "D:\\ForCharactersLoading"
 GAME_CARD_PATH = "D:\\BaiduNetdiskDownload\\Rat_Koikatu_F_20250714223150741_Yixuan.png"
+MOD_NOT_IN_GAME = "当前mod在游戏中不存在"
+MOD_NOT_FOUND = "Not Found"
+ASSET_SUFFIXES = ('.unity3d',)  # 游戏加载时读取的资源包
 
 
 class CardType(Enum):
     CHARACTER = 0
     CLOTHES = 1
+    SCENE = 2
+
+
+# 从zip中央目录统计文件数量与大小，不解压任何文件
+def get_zip_mod_stats(zip_ref):
+    stats = {'file_count': 0, 'compress_size': 0, 'file_size': 0,
+             'asset_count': 0, 'asset_compress_size': 0, 'asset_file_size': 0}
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        stats['file_count'] += 1
+        stats['compress_size'] += info.compress_size
+        stats['file_size'] += info.file_size
+        if info.filename.lower().endswith(ASSET_SUFFIXES):
+            stats['asset_count'] += 1
+            stats['asset_compress_size'] += info.compress_size
+            stats['asset_file_size'] += info.file_size
+    return stats
 
 
 def get_zip_mod_guid(mod_dir):
@@ -44,21 +68,79 @@ def get_zip_mod_guid(mod_dir):
                     result = {elem.tag: elem.text or None for elem in root}
                     result['schema-ver'] = root.attrib['schema-ver']  # 添加属性
                     # print(result)
+                    result['stats'] = get_zip_mod_stats(zip_ref)
                     return result
     except Exception as e:
         logger.info(e)
         return None
 
 
+# 扫描时跳过的文件夹（不区分大小写），如禁用的mod、备份
+IGNORED_MOD_DIRS = {"_disabled", "disabled", "backup", "backups", "_kk_profile_disabled"}
+# 扫描时排除的路径通配符，匹配相对mod根目录的路径（使用/分隔）
+EXCLUDE_MOD_GLOBS = ()
+
+
+def _is_excluded(relative_path, exclude_globs):
+    return any(fnmatch.fnmatch(relative_path, pattern) for pattern in exclude_globs)
+
+
+# 遍历mod目录，边扫描边返回zipmod的DirEntry，可剪枝忽略的目录
+def iter_zipmod_entries(mod_path, exclude_globs=EXCLUDE_MOD_GLOBS, ignored_dirs=IGNORED_MOD_DIRS):
+    ignored_dirs = {d.lower() for d in ignored_dirs}
+
+    def skip_dir(entry, relative_path):
+        return entry.name.lower() in ignored_dirs or _is_excluded(relative_path, exclude_globs)
+
+    for entry, relative_path in iter_files(mod_path, ('.zipmod',), skip_dir):
+        if not _is_excluded(relative_path, exclude_globs):
+            yield entry
+
+
+# 读取已有的mod json 以mod_dir为key 用于增量扫描
+def _load_mod_json_by_dir(mod_json_path):
+    if not os.path.exists(mod_json_path):
+        return {}
+    try:
+        with open(mod_json_path, "r", encoding="utf-8") as f:
+            old_mod_map = json.load(f)
+    except Exception as e:
+        logger.info("旧mod json读取失败，将全量扫描：%s", e)
+        return {}
+    return {info['mod_dir']: (guid, info) for guid, info in old_mod_map.items() if 'mod_dir' in info}
+
+
 # 生成mod的guid和mod路径映射json
-def generate_mod_json_file(mod_path, mod_json_path):
+# 已记录过且大小、修改时间未变的zipmod直接复用旧数据，不再打开压缩包；缺少统计信息或版本号的旧记录重新读取
+def generate_mod_json_file(mod_path, mod_json_path, exclude_globs=EXCLUDE_MOD_GLOBS,
+                           ignored_dirs=IGNORED_MOD_DIRS):
+    old_mod_map = _load_mod_json_by_dir(mod_json_path)
+    root = os.path.normpath(mod_path)
     kk_mod_map = {}
-    for zipmod_path in Path(mod_path).glob('**/*.zipmod'):
-        zip_mod_data_map = get_zip_mod_guid(zipmod_path)
+    reused_count = 0
+    for entry in iter_zipmod_entries(mod_path, exclude_globs, ignored_dirs):
+        mod_dir = entry.path[len(root):].lstrip("\\/")
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            # 扫描过程中被删除或占用的zipmod跳过，不影响其他mod
+            logger.info("mod读取失败 %s: %s", entry.path, e)
+            continue
+        old = old_mod_map.get(mod_dir)
+        if old and old[1].get('size') == stat.st_size and old[1].get('mtime') == stat.st_mtime_ns \
+                and 'file_size' in old[1] and 'version' in old[1]:
+            kk_mod_map[old[0]] = old[1]
+            reused_count += 1
+            continue
+        zip_mod_data_map = get_zip_mod_guid(entry.path)
         if zip_mod_data_map:
             kk_mod_map[zip_mod_data_map['guid']] = {'name': zip_mod_data_map['name'],
-                                                    'mod_dir': get_relative_path(zipmod_path, mod_path)}
-    logger.info(f"本次共扫描%s个mod", len(kk_mod_map))
+                                                    'version': zip_mod_data_map.get('version'),
+                                                    'mod_dir': mod_dir,
+                                                    'size': stat.st_size,
+                                                    'mtime': stat.st_mtime_ns,
+                                                    **zip_mod_data_map['stats']}
+    logger.info(f"本次共扫描%s个mod，其中%s个未变化", len(kk_mod_map), reused_count)
     with open(mod_json_path, "w", encoding="utf-8") as f:
         json.dump(kk_mod_map, f, indent=4, ensure_ascii=False)  # ensure_ascii=False 支持中文
 
@@ -81,10 +163,32 @@ def get_relative_path(full_path, root_path):
         return full_path  # 或者返回原路径
 
 
+# 根据 IEND 之后的头部标识判断卡片类型，无法识别时返回None
+def detect_card_type(card_path):
+    with open(card_path, 'rb') as f:
+        if not seek_png_end(f):
+            return None
+        header = f.read(32)
+    if CHECK_KEY in header:
+        return CardType.CLOTHES
+    if CHARA_CHECK_KEY in header:
+        return CardType.CHARACTER
+    if is_scene_header(header):
+        return CardType.SCENE
+    return None
+
+
 def get_card_mod_info(card_path, card_type: CardType):
+    return get_card_mod_and_plugin_info(card_path, card_type)[0]
+
+
+# 一次解析同时取出卡片mod和人物卡 KKEx 的顶层key（插件ID），非人物卡的插件ID为None
+def get_card_mod_and_plugin_info(card_path, card_type: CardType):
     mod_set = set()
+    kkex_keys = None
     if card_type == CardType.CHARACTER:
         kc = KoikatuCharaData.load(card_path)
+        kkex_keys = set(kc['KKEx'].data.keys())
         start = 8
         # /xa4 结尾
         # print(kc['KKEx']['data']['com.bepis.sideloader.universalautoresolver'][1]['info'])
@@ -100,7 +204,19 @@ def get_card_mod_info(card_path, card_type: CardType):
         if not kc.has_clothes_card:
             raise Exception("该图片不是服装卡")
         mod_set = kc.card_mod_set
-    return mod_set
+    if card_type == CardType.SCENE:
+        kc = KKSceneData.pares_scene_card(card_path)
+        logger.info("场景卡解析结果：版本%s，共%s个mod", kc.scene_version, len(kc.card_mod_set))
+        if not kc.has_scene_card:
+            raise Exception("该图片不是场景卡")
+        mod_set = kc.card_mod_set
+    return mod_set, kkex_keys
+
+
+# 获取人物卡 KKEx 的顶层key，即写入扩展数据的插件ID
+def get_card_kkex_keys(card_path):
+    kc = KoikatuCharaData.load(card_path)
+    return set(kc['KKEx'].data.keys())
 
 
 # 去除mod的guid的首尾空格
@@ -159,6 +275,140 @@ def save_missing_mod_info_json_file(missing_mod_map):
         json.dump(missing_mod_map, f, ensure_ascii=False, indent=4)
 
 
+# 估算mod的加载开销（字节），以解压后的资源包大小为准，旧索引没有统计信息时返回None
+def estimate_mod_load_cost(mod_info):
+    if mod_info is None or 'file_size' not in mod_info:
+        return None
+    return mod_info['asset_file_size'] or mod_info['file_size']
+
+
+# 去除卡片中mod的guid首尾多余字符
+def normalize_mod_guid(guid):
+    return guid.strip(" !$'\"")
+
+
+class ModStatus(Enum):
+    INSTALLED = 0  # 游戏中已有
+    MISSING = 1  # 游戏中没有，仓库中有
+    NOT_FOUND = 2  # 游戏和仓库中都没有
+
+
+class ModRecord:
+    """
+    卡片中一个mod的分析结果
+
+    Attributes:
+        guid: mod的guid
+        status: ModStatus
+        root: mod所在根目录（游戏mod路径或仓库路径），未找到时为None
+        mod_dir: 相对根目录的zipmod路径，未找到时为None
+        size: zipmod文件大小
+        cost: 预估加载开销（字节）
+        version: mod版本
+    """
+    __slots__ = ('guid', 'status', 'root', 'mod_dir', 'size', 'cost', 'version')
+
+    def __init__(self, guid, status, root=None, mod_dir=None, size=None, cost=None, version=None):
+        self.guid = guid
+        self.status = status
+        self.root = root
+        self.mod_dir = mod_dir
+        self.size = size
+        self.cost = cost
+        self.version = version
+
+    def __repr__(self):
+        return f"ModRecord({self.guid}, {self.status.name}, {self.mod_dir})"
+
+    @property
+    def path(self):
+        if self.mod_dir is None:
+            return None
+        return os.path.join(self.root, self.mod_dir)
+
+    # 卡片mod列表中显示的内容
+    @property
+    def game_text(self):
+        return self.mod_dir if self.status == ModStatus.INSTALLED else MOD_NOT_IN_GAME
+
+    # 缺失mod列表中显示的内容
+    @property
+    def repository_text(self):
+        return MOD_NOT_FOUND if self.status == ModStatus.NOT_FOUND else self.mod_dir
+
+    def to_dict(self):
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data['status'] = self.status.name
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data['status'] = ModStatus[data['status']]
+        return cls(**data)
+
+
+class ModAnalyzer:
+    """
+    卡片mod分析，桌面程序、命令行、常驻服务共用
+    游戏与仓库的mod索引只保留引用，分析时用集合运算区分已安装/缺失/未找到
+    """
+
+    def __init__(self, game_mod_json, repository_mod_json, game_path=None, repository_path=None):
+        self.game_mod_json = game_mod_json
+        self.repository_mod_json = repository_mod_json
+        self.game_path = game_path
+        self.repository_path = repository_path
+
+    def _make_record(self, guid, status, root, mod_info):
+        return ModRecord(guid, status, root, mod_info['mod_dir'], mod_info.get('size'),
+                         estimate_mod_load_cost(mod_info), mod_info.get('version'))
+
+    def build_records(self, guids):
+        """guids 需已规范化，返回 guid -> ModRecord"""
+        missing = guids - self.game_mod_json.keys()
+        not_found = missing - self.repository_mod_json.keys()
+        records = {}
+        for guid in guids - missing:
+            records[guid] = self._make_record(guid, ModStatus.INSTALLED, self.game_path, self.game_mod_json[guid])
+        for guid in missing - not_found:
+            records[guid] = self._make_record(guid, ModStatus.MISSING, self.repository_path,
+                                              self.repository_mod_json[guid])
+        for guid in not_found:
+            records[guid] = ModRecord(guid, ModStatus.NOT_FOUND)
+        return records
+
+    def analyze(self, card_mod_set):
+        """分析一张卡片，返回 ModRecord 列表"""
+        guids = {normalize_mod_guid(mod) for mod in card_mod_set}
+        return list(self.build_records(guids).values())
+
+    def analyze_batch(self, card_mod_sets):
+        """
+        批量分析多张卡片，所有卡片的mod先合并，只做一次集合运算
+
+        Args:
+            card_mod_sets: 卡片 -> 卡片mod集合
+
+        Returns:
+            dict: 卡片 -> ModRecord 列表，同一mod在各卡片间共用同一个记录
+        """
+        card_guids = {card: {normalize_mod_guid(mod) for mod in mods} for card, mods in card_mod_sets.items()}
+        records = self.build_records(set().union(*card_guids.values()))
+        return {card: [records[guid] for guid in guids] for card, guids in card_guids.items()}
+
+
+# 缺失mod报告 guid -> 仓库中的路径或Not Found
+def get_missing_mod_report(records):
+    return {r.guid: r.repository_text for r in records if r.status != ModStatus.INSTALLED}
+
+
+# 预估加载总量（字节）和缺少统计信息的mod数量
+def sum_mod_load_cost(records):
+    costs = [r.cost for r in records if r.cost is not None]
+    return sum(costs), len(records) - len(costs)
+
+
 def analysis_card():
     # 获取仓库mod信息
     repository_mod_json = load_mod_repository_json_file()
@@ -172,20 +422,15 @@ def analysis_card():
         return
     # 获取卡片mod信息
     card_mod_info = get_card_mod_info(GAME_CARD_PATH, CardType.CHARACTER)
-    missing_mod_set = card_mod_info - game_mod_json.keys()
-    missing_mod_map = {}
-    missing_mod_flag = False
-    if len(missing_mod_set) == 0:
+    analyzer = ModAnalyzer(game_mod_json, repository_mod_json, GAME_MOD_PATH, MOD_REPOSITORY_PATH)
+    records = analyzer.analyze(card_mod_info)
+    logger.info("当前卡片预估加载%.2fMB", sum_mod_load_cost(records)[0] / 1024 / 1024)
+    missing_mod_map = get_missing_mod_report(records)
+    if len(missing_mod_map) == 0:
         logger.info("当前卡片在本游戏mod资源中无缺失")
     else:
-        for mod in missing_mod_set:
-            if mod in repository_mod_json:
-                missing_mod_map[mod] = repository_mod_json.get(mod)['mod_dir']
-            else:
-                missing_mod_map[mod] = "Not Found"
-                missing_mod_flag = True
         save_missing_mod_info_json_file(missing_mod_map)
-        if missing_mod_flag:
+        if any(r.status == ModStatus.NOT_FOUND for r in records):
             logger.info("仓库中存在当前卡片不存在的mod，请更新仓库mod信息")
 
 
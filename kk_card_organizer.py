@@ -0,0 +1,238 @@
+"""
+恋活卡片整理
+按 fileCreate.file_dict 的 mmd/<作品>/<角色> 目录结构，根据卡片内角色名、文件名和所在文件夹名把下载的卡片硬链接（默认）或移动到对应目录。
+已处理过的卡片记录在状态文件中，重复运行只处理新卡片。
+
+python kk_card_organizer.py 下载目录 --dry-run
+python kk_card_organizer.py 下载目录
+python kk_card_organizer.py 下载目录 --mode move
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from fileCreate import file_dict, generate_file
+from kk_file_walker import iter_files
+from logger_handler import get_logger
+
+logger = get_logger()
+
+STATE_FILE_NAME = "kk_card_organizer_state.json"
+
+# 角色别名 -> file_dict 中的角色名
+ALIAS_DICT = {
+    "雷神": "雷电将军",
+    "心海": "珊瑚宫心海",
+    "绫华": "神里绫华",
+    "神子": "八重神子",
+    "爱莉": "爱莉希雅",
+    "符华": "浮华",
+}
+
+# 文本分词，单字角色名必须与整个词相同才算匹配
+TOKEN_SPLIT_PATTERN = re.compile(r"[\s\d_\-.,+&~!?()\[\]{}【】（）《》「」『』·・、，。！？]+")
+
+
+class CardNameLookup:
+    """角色名/别名 -> [(作品, 角色)] 的预建索引，用一个正则一次扫描文本"""
+
+    def __init__(self, names=None, aliases=None):
+        names = file_dict if names is None else names
+        aliases = ALIAS_DICT if aliases is None else aliases
+        self.name_map = {}
+        for franchise, characters in names.items():
+            for character in characters:
+                targets = self.name_map.setdefault(character, [])
+                if (franchise, character) not in targets:
+                    targets.append((franchise, character))
+        for alias, character in aliases.items():
+            targets = self.name_map.setdefault(alias, [])
+            for franchise, characters in names.items():
+                if character in characters and (franchise, character) not in targets:
+                    targets.append((franchise, character))
+        self.franchises = list(names)
+        # 单字名（星、梅、简等）容易出现在普通词语中，只按整词匹配
+        self.single_char_names = {k for k in self.name_map if len(k) == 1}
+        # 长名字优先，避免“星见雅”被“星”抢先匹配
+        keys = sorted((k for k in self.name_map if len(k) > 1), key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(k) for k in keys)) if keys else None
+
+    def find_names(self, text):
+        names = self.pattern.findall(text) if self.pattern else []
+        if self.single_char_names:
+            names.extend(t for t in TOKEN_SPLIT_PATTERN.split(text) if t in self.single_char_names)
+        return names
+
+    def match(self, *texts):
+        """按顺序匹配文本，返回唯一匹配的(作品, 角色)，无匹配或有歧义时返回None"""
+        # 任意文本中带有作品名时优先该作品（例如同名的“姬子”）
+        all_text = " ".join(t for t in texts if t)
+        hinted_franchises = {f for f in self.franchises if f in all_text}
+        for text in texts:
+            if not text:
+                continue
+            candidates = []
+            for name in self.find_names(text):
+                for target in self.name_map[name]:
+                    if target not in candidates:
+                        candidates.append(target)
+            hinted = [c for c in candidates if c[0] in hinted_franchises]
+            if hinted:
+                candidates = hinted
+            if len(candidates) == 1:
+                return candidates[0]
+        return None
+
+
+# 读取人物卡中的角色名，非人物卡返回空列表（在子进程中执行）
+def read_card_names(card_path):
+    try:
+        from kkloader import KoikatuCharaData
+        kc = KoikatuCharaData.load(card_path)
+        parameter = kc['Parameter']
+        names = [parameter['lastname'] + parameter['firstname'], parameter['firstname'], parameter['nickname']]
+        return [n.strip() for n in names if n and n.strip()]
+    except Exception:
+        return []
+
+
+def iter_new_cards(source_path, state, retry_unmatched=False):
+    """遍历来源目录下的png卡片，跳过状态文件中大小和修改时间都未变化的卡片"""
+    for entry, _ in iter_files(source_path, ('.png',)):
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.info("卡片读取失败 %s: %s", entry.path, e)
+            continue
+        record = state.get(entry.path)
+        if record and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns \
+                and not (retry_unmatched and record['target'] is None):
+            continue
+        yield entry.path, stat
+
+
+def load_state(base_path):
+    state_path = os.path.join(base_path, STATE_FILE_NAME)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(base_path, state):
+    with open(os.path.join(base_path, STATE_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+
+
+def is_same_card(source, target):
+    """目标是来源的硬链接或内容完全相同，同名同大小的不同卡片不算"""
+    try:
+        return os.path.samefile(source, target) or filecmp.cmp(source, target, shallow=False)
+    except OSError:
+        return False
+
+
+def place_card(source, target, mode):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if mode == "link":
+        os.link(source, target)
+    else:
+        shutil.move(source, target)
+
+
+def organize_cards(source_path, base_path=None, mode="link", dry_run=False, workers=None, retry_unmatched=False):
+    """
+    整理卡片到 mmd/<作品>/<角色> 目录
+
+    Args:
+        source_path: 待整理卡片所在目录
+        base_path: mmd目录，默认当前目录下的mmd
+        mode: link 硬链接（默认，保留原文件） / move 移动
+        dry_run: 只生成报告，不移动文件也不写状态
+        workers: 解析卡片的进程数
+        retry_unmatched: 重新匹配之前未匹配的卡片（更新了file_dict或别名后使用）
+
+    Returns:
+        dict: 报告 {"placed": [(来源, 目标)], "skipped": [(来源, 目标)], "unmatched": [来源], "conflict": [(来源, 目标)]}
+    """
+    if base_path is None:
+        base_path = os.path.join(os.getcwd(), "mmd")
+    if not dry_run:
+        generate_file(base_path)
+    state = load_state(base_path)
+    lookup = CardNameLookup()
+    report = {"placed": [], "skipped": [], "unmatched": [], "conflict": []}
+
+    new_cards = list(iter_new_cards(source_path, state, retry_unmatched))
+    logger.info("待整理卡片%s张", len(new_cards))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        card_names_list = executor.map(read_card_names, [path for path, _ in new_cards], chunksize=16)
+        for (card_path, stat), card_names in zip(new_cards, card_names_list):
+            file_name = os.path.basename(card_path)
+            # 只用卡片内的角色名、文件名和所在文件夹名，不用完整路径，避免下载目录名把所有卡片带偏
+            folder_name = os.path.basename(os.path.dirname(card_path))
+            target_dir = lookup.match(*card_names, os.path.splitext(file_name)[0], folder_name)
+            if target_dir is None:
+                report["unmatched"].append(card_path)
+                state[card_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "target": None}
+                continue
+
+            target = os.path.join(base_path, *target_dir, file_name)
+            record = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "target": target}
+            if os.path.exists(target):
+                if is_same_card(card_path, target):
+                    report["skipped"].append((card_path, target))
+                    state[card_path] = record
+                else:
+                    report["conflict"].append((card_path, target))
+                continue
+
+            if not dry_run:
+                try:
+                    place_card(card_path, target, mode)
+                except OSError as e:
+                    logger.info("卡片整理失败 %s: %s", card_path, e)
+                    report["conflict"].append((card_path, target))
+                    continue
+                # 移动后来源已不存在，不需要记录
+                if mode == "link":
+                    state[card_path] = record
+            report["placed"].append((card_path, target))
+
+    if not dry_run:
+        save_state(base_path, state)
+    logger.info("整理完成：放置%s张，已存在%s张，未匹配%s张，冲突%s张", len(report["placed"]),
+                len(report["skipped"]), len(report["unmatched"]), len(report["conflict"]))
+    return report
+
+
+def print_report(report, dry_run):
+    action = "将放置" if dry_run else "已放置"
+    for source, target in report["placed"]:
+        print(f"{action}: {source} -> {target}")
+    for source, target in report["conflict"]:
+        print(f"冲突: {source} -> {target}")
+    for source in report["unmatched"]:
+        print(f"未匹配: {source}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按角色整理恋活卡片")
+    parser.add_argument("source", help="待整理卡片目录")
+    parser.add_argument("--base", default=None, help="mmd目录，默认当前目录下的mmd")
+    parser.add_argument("--mode", choices=["link", "move"], default="link", help="硬链接（默认）或移动")
+    parser.add_argument("--dry-run", action="store_true", help="只输出报告")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数")
+    parser.add_argument("--retry-unmatched", action="store_true", help="重新匹配之前未匹配的卡片")
+    args = parser.parse_args()
+    report = organize_cards(args.source, args.base, args.mode, args.dry_run, args.workers, args.retry_unmatched)
+    print_report(report, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,13 +7,56 @@ from PySide6.QtGui import QShortcut, QKeySequence, QIcon
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                                QHBoxLayout, QPushButton,
                                QFileDialog, QLabel, QMessageBox, QTableWidget, QAbstractItemView,
-                               QHeaderView, QTableWidgetItem, QMenu, QSizePolicy)
-from PySide6.QtCore import Qt, QPoint
+                               QHeaderView, QTableWidgetItem, QMenu, QSizePolicy, QLineEdit)
+from PySide6.QtCore import Qt, QPoint, QObject, QRunnable, QThreadPool, Signal
 import json
 import kk_card_match_mod as kk_core
+import kk_mod_daemon as kk_daemon
+import kk_mod_pack
+import kk_plugin_index
+from kk_mod_search import ModSearchIndex
+from kk_card_library_view import CardLibraryDialog
 from logger_handler import get_logger
 
 
+MB = 1024 * 1024
+SEARCH_PAGE_SIZE = 100
+MOD_TABLE_HEADERS = ['mod名称', 'mod路径', '预估加载(MB)']
+PLUGIN_TABLE_HEADERS = ['卡片扩展数据', '插件检查结果', '']
+
+
+class NumericTableWidgetItem(QTableWidgetItem):
+    """按 Qt.UserRole 中的数值排序的表格项"""
+
+    def __lt__(self, other):
+        return self.data(Qt.UserRole) < other.data(Qt.UserRole)
+
+
+class _SearchIndexSignals(QObject):
+    finished = Signal(object, object)  # (仓库mod json, ModSearchIndex)
+
+
+class _SearchIndexTask(QRunnable):
+    """后台建立仓库mod搜索索引，未传入mod json时先读取json文件"""
+
+    def __init__(self, signals, mod_json=None, json_path=None):
+        super().__init__()
+        self.signals = signals
+        self.mod_json = mod_json
+        self.json_path = json_path
+
+    def run(self):
+        try:
+            mod_json = self.mod_json
+            if mod_json is None:
+                with open(self.json_path, "r", encoding="utf-8") as f:
+                    mod_json = json.load(f)
+            self.signals.finished.emit(mod_json, ModSearchIndex(mod_json))
+        except Exception as e:
+            get_logger().info("mod搜索索引建立失败：%s", e)
+            self.signals.finished.emit(None, None)
+
+
 class ImageAnalyzerApp(QMainWindow):
     mod_file_name = "kk_mod.json"
     config_file_name = "kk_card_tool_config.json"
@@ -23,16 +66,28 @@ class ImageAnalyzerApp(QMainWindow):
         self.logger = None
         self.mod_repository_path = ""
         self.mod_game_path = ""
+        self.plugins_path = ""
         self.mod_repository_data_cache = None
         self.mod_game_data_cache = None
         self.card_path = ""
         self.card_type = kk_core.CardType.CHARACTER
-        self.current_card_mod_map = {}
-        self.missing_mod_map = {}
+        self.mod_records = []
+        self.plugin_issues = {}  # 未安装或过旧的插件 KKEx key -> (状态, 说明)
+        self.daemon_available = None  # 常驻服务是否启动，None表示尚未检测
+        self.mod_search_index = None
+        self.search_index_building = False
+        self.search_page = 0
         self.results = []
+        self.search_index_signals = _SearchIndexSignals()
+        self.search_index_signals.finished.connect(self.on_search_index_ready)
         self.setup_logging()
         self.init_ui()
         self.load_config()
+        # 启动时后台读取仓库mod信息并建立搜索索引，首次搜索不需要等待
+        if self.mod_repository_path and os.path.exists(os.path.join(self.mod_repository_path, self.mod_file_name)):
+            self.search_index_building = True
+            QThreadPool.globalInstance().start(_SearchIndexTask(
+                self.search_index_signals, json_path=os.path.join(self.mod_repository_path, self.mod_file_name)))
 
     def setup_logging(self):
 
@@ -93,6 +148,11 @@ class ImageAnalyzerApp(QMainWindow):
         self.btn_clothes.clicked.connect(self.select_clothes_image)
         button_layout.addWidget(self.btn_clothes)
 
+        # 场景卡图片
+        self.btn_scene = QPushButton('请选择场景卡')
+        self.btn_scene.clicked.connect(self.select_scene_image)
+        button_layout.addWidget(self.btn_scene)
+
         # 第五个按钮：保存路径
         self.btn_save = QPushButton('保存路径配置信息')
         self.btn_save.clicked.connect(self.save_config)
@@ -107,11 +167,16 @@ class ImageAnalyzerApp(QMainWindow):
         self.label_folder2 = QLabel('游戏mod路径: 未选择')
         self.label_chara_image_path = QLabel('人物卡路径: 未选择')
         self.label_clothes_image_path = QLabel('服装卡路径: 未选择')
+        self.label_scene_image_path = QLabel('场景卡路径: 未选择')
 
         path_layout.addWidget(self.label_folder1)
         path_layout.addWidget(self.label_folder2)
         path_layout.addWidget(self.label_chara_image_path)
         path_layout.addWidget(self.label_clothes_image_path)
+        path_layout.addWidget(self.label_scene_image_path)
+
+        self.label_load_cost = QLabel('预估加载: 未解析')
+        path_layout.addWidget(self.label_load_cost)
 
         main_layout.addLayout(path_layout)
 
@@ -127,6 +192,14 @@ class ImageAnalyzerApp(QMainWindow):
         button_layout2.addWidget(self.btn_cp_mod)
         main_layout.addLayout(button_layout2)
 
+        # 导出卡片mod包按钮
+        self.btn_export_mod_pack = QPushButton('导出卡片mod包')
+        self.btn_export_mod_pack.clicked.connect(self.export_mod_pack)
+        self.btn_export_mod_pack.setSizePolicy(QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Preferred))
+        self.btn_export_mod_pack.setMinimumWidth(120)
+        button_layout2.addWidget(self.btn_export_mod_pack)
+        main_layout.addLayout(button_layout2)
+
         # 展示当前卡片的mod信息
         self.btn_show_mod = QPushButton('展示卡片mod信息')
         self.btn_show_mod.clicked.connect(self.show_current_card_mod_info)
@@ -143,6 +216,22 @@ class ImageAnalyzerApp(QMainWindow):
         button_layout2.addWidget(self.btn_show_miss_mod)
         main_layout.addLayout(button_layout2)
 
+        # 检查当前卡片依赖的BepInEx插件，与mod检查相互独立
+        self.btn_show_plugin = QPushButton('卡片插件信息')
+        self.btn_show_plugin.setToolTip('列出卡片扩展数据对应的全部BepInEx插件，未安装或过旧的插件也会在解析结果中与缺失mod一起显示')
+        self.btn_show_plugin.clicked.connect(self.show_current_card_plugin_info)
+        self.btn_show_plugin.setSizePolicy(QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Preferred))
+        self.btn_show_plugin.setMinimumWidth(120)
+        button_layout2.addWidget(self.btn_show_plugin)
+
+        # 卡片库预览按钮
+        self.btn_card_library = QPushButton('卡片库预览')
+        self.btn_card_library.clicked.connect(self.open_card_library)
+        self.btn_card_library.setSizePolicy(QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Preferred))
+        self.btn_card_library.setMinimumWidth(120)
+        button_layout2.addWidget(self.btn_card_library)
+        main_layout.addLayout(button_layout2)
+
         # 重新解析卡片按钮
         self.btn_analyze_card = QPushButton('重新解析卡片')
         self.btn_analyze_card.clicked.connect(self.analyze_image)
@@ -151,6 +240,22 @@ class ImageAnalyzerApp(QMainWindow):
         button_layout2.addWidget(self.btn_analyze_card)
         main_layout.addLayout(button_layout2)
 
+        # mod搜索
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('搜索仓库mod（GUID/名称/路径）')
+        self.search_input.textChanged.connect(self.search_mod)
+        search_layout.addWidget(self.search_input)
+        self.btn_search_prev = QPushButton('上一页')
+        self.btn_search_prev.clicked.connect(self.search_prev_page)
+        search_layout.addWidget(self.btn_search_prev)
+        self.btn_search_next = QPushButton('下一页')
+        self.btn_search_next.clicked.connect(self.search_next_page)
+        search_layout.addWidget(self.btn_search_next)
+        self.label_search_page = QLabel('')
+        search_layout.addWidget(self.label_search_page)
+        main_layout.addLayout(search_layout)
+
         # 解析结果table
         self.setup_table()
         main_layout.addWidget(self.table_widget)
@@ -158,8 +263,8 @@ class ImageAnalyzerApp(QMainWindow):
     def setup_table(self):
         """设置表格视图"""
         self.table_widget = QTableWidget()
-        self.table_widget.setColumnCount(2)  # 两列
-        self.table_widget.setHorizontalHeaderLabels(['mod名称', 'mod路径'])
+        self.table_widget.setColumnCount(3)  # 三列
+        self.table_widget.setHorizontalHeaderLabels(MOD_TABLE_HEADERS)
 
         # 设置表格样式
         self.table_widget.setStyleSheet("""
@@ -199,6 +304,9 @@ class ImageAnalyzerApp(QMainWindow):
         header = self.table_widget.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)  # 第一列自适应
         header.setSectionResizeMode(1, QHeaderView.ResizeToContents)  # 第二列根据内容调整
+        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        # 点击表头排序
+        self.table_widget.setSortingEnabled(True)
 
         # 添加复制功能支持
         self.setup_copy_function()
@@ -262,22 +370,39 @@ class ImageAnalyzerApp(QMainWindow):
             QApplication.clipboard().setText(copied_text.strip())
             self.logger.info("内容已复制到剪贴板")
 
-    def add_result_item(self, filename, result):
-        """向表格中添加解析结果"""
+    def fill_table(self, rows, headers=MOD_TABLE_HEADERS):
+        """
+        清空表格并填充 (名称, 结果, 预估加载) 行
+        填充期间关闭排序，全部插入后只排序一次，场景卡上千个mod时不会逐行重排
+        """
+        self.clear_table(headers)
+        self.table_widget.setSortingEnabled(False)
+        try:
+            for filename, result, cost in rows:
+                self.add_result_item(filename, result, cost)
+        finally:
+            self.table_widget.setSortingEnabled(True)
+
+    def add_result_item(self, filename, result, cost=None):
+        """向表格中添加解析结果，调用方需先关闭排序，见 fill_table"""
         row_position = self.table_widget.rowCount()
         self.table_widget.insertRow(row_position)
 
         # 创建表格项
         filename_item = QTableWidgetItem(filename)
         result_item = QTableWidgetItem(result)
+        cost_item = NumericTableWidgetItem('' if cost is None else f'{cost / MB:.2f}')
+        cost_item.setData(Qt.UserRole, -1 if cost is None else cost)
 
         # 设置项的对齐方式
         filename_item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
         result_item.setTextAlignment(Qt.AlignCenter | Qt.AlignVCenter)
+        cost_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
 
         # 添加到表格
         self.table_widget.setItem(row_position, 0, filename_item)
         self.table_widget.setItem(row_position, 1, result_item)
+        self.table_widget.setItem(row_position, 2, cost_item)
 
         # 添加分割线效果 - 通过设置行高和样式来实现
         self.table_widget.setRowHeight(row_position, 35)  # 设置行高
@@ -298,7 +423,7 @@ class ImageAnalyzerApp(QMainWindow):
             kk_core.generate_mod_json_file(self.mod_repository_path,
                                            os.path.join(self.mod_repository_path, self.mod_file_name))
             # 更新软件缓存mod信息
-            self.load_mod_repository_json_file()
+            self.set_repository_data(self.load_mod_repository_json_file())
             QMessageBox.information(self, "success", "仓库mod数据生成完毕")
         except Exception as e:
             self.logger.info("mod仓库json生成失败：{}", e)
@@ -313,7 +438,7 @@ class ImageAnalyzerApp(QMainWindow):
             kk_core.generate_mod_json_file(self.mod_game_path,
                                            os.path.join(self.mod_game_path, self.mod_file_name))
             # 更新软件缓存mod信息
-            self.load_mod_game_json_file()
+            self.mod_game_data_cache = self.load_mod_game_json_file()
             QMessageBox.information(self, "success", "游戏mod数据生成完毕")
         except Exception as e:
             self.logger.info("游戏mod信息json生成失败：{}", e)
@@ -332,11 +457,7 @@ class ImageAnalyzerApp(QMainWindow):
             self, "选择图片", "", "图片文件 (*.png)"
         )
         if file_path:
-            self.card_path = file_path
-            self.label_chara_image_path.setText(f'人物卡路径: {file_path}')
-            self.label_clothes_image_path.setText(f'服装卡路径: 未选择')
-            self.card_type = kk_core.CardType.CHARACTER
-            self.analyze_image()
+            self.set_card(file_path, kk_core.CardType.CHARACTER)
 
     def select_clothes_image(self):
         """选择图片文件"""
@@ -344,11 +465,71 @@ class ImageAnalyzerApp(QMainWindow):
             self, "选择图片", "", "图片文件 (*.png)"
         )
         if file_path:
-            self.card_path = file_path
-            self.label_chara_image_path.setText(f'人物卡路径: 未选择')
+            self.set_card(file_path, kk_core.CardType.CLOTHES)
+
+    def select_scene_image(self):
+        """选择场景卡文件"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择图片", "", "图片文件 (*.png)"
+        )
+        if file_path:
+            self.set_card(file_path, kk_core.CardType.SCENE)
+
+    def set_card(self, file_path, card_type):
+        """设置当前卡片并解析，卡片类型以文件头识别结果为准"""
+        try:
+            detected_card_type = kk_core.detect_card_type(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"读取卡片失败: {str(e)}")
+            return
+        if detected_card_type is not None and detected_card_type != card_type:
+            self.logger.info("卡片类型识别为%s", detected_card_type.name)
+            card_type = detected_card_type
+        self.card_path = file_path
+        self.card_type = card_type
+        self.label_chara_image_path.setText(f'人物卡路径: 未选择')
+        self.label_clothes_image_path.setText(f'服装卡路径: 未选择')
+        self.label_scene_image_path.setText(f'场景卡路径: 未选择')
+        if card_type == kk_core.CardType.CHARACTER:
+            self.label_chara_image_path.setText(f'人物卡路径: {file_path}')
+        elif card_type == kk_core.CardType.CLOTHES:
             self.label_clothes_image_path.setText(f'服装卡路径: {file_path}')
-            self.card_type = kk_core.CardType.CLOTHES
-            self.analyze_image()
+        else:
+            self.label_scene_image_path.setText(f'场景卡路径: {file_path}')
+        self.analyze_image()
+
+    def open_card_library(self):
+        """选择卡片文件夹并打开卡片库预览"""
+        folder_path = QFileDialog.getExistingDirectory(self, "请选择卡片文件夹")
+        if folder_path:
+            self.card_library_dialog = CardLibraryDialog(folder_path, self.select_library_card, self)
+            self.card_library_dialog.show()
+
+    def select_library_card(self, card_path):
+        """卡片库中双击的卡片"""
+        self.set_card(card_path, kk_core.CardType.CHARACTER)
+
+    def set_repository_data(self, mod_json):
+        """更新仓库mod缓存，并在后台重建搜索索引"""
+        self.mod_repository_data_cache = mod_json
+        self.mod_search_index = None
+        self.search_index_building = True
+        QThreadPool.globalInstance().start(_SearchIndexTask(self.search_index_signals, mod_json=mod_json))
+
+    def on_search_index_ready(self, mod_json, search_index):
+        if search_index is None:
+            self.search_index_building = False
+            self.label_search_page.setText('')
+            return
+        if self.mod_repository_data_cache is None:
+            self.mod_repository_data_cache = mod_json
+        elif mod_json is not self.mod_repository_data_cache:
+            # 建立期间仓库mod信息已更新，丢弃旧索引
+            return
+        self.mod_search_index = search_index
+        self.search_index_building = False
+        if self.search_input.text().strip():
+            self.show_search_page()
 
     # 加载仓库的mod json数据
     def load_mod_repository_json_file(self):
@@ -360,55 +541,70 @@ class ImageAnalyzerApp(QMainWindow):
         with open(os.path.join(self.mod_game_path, self.mod_file_name), "r", encoding="utf-8") as f:
             return json.load(f)
 
-    def clear_table(self):
+    def clear_table(self, headers=MOD_TABLE_HEADERS):
         """清空表格数据"""
         self.table_widget.setRowCount(0)
+        self.table_widget.setHorizontalHeaderLabels(headers)
 
     def analyze_image(self):
         """解析图片的逻辑"""
-        try:
-            if self.mod_repository_data_cache is None:
-                self.mod_repository_data_cache = self.load_mod_repository_json_file()
-        except:
-            QMessageBox.critical(self, "错误", "请先生成仓库mod信息")
-            return
-
-        try:
-            if self.mod_game_data_cache is None:
-                self.mod_game_data_cache = self.load_mod_game_json_file()
-        except:
-            QMessageBox.critical(self, "错误", "请先生成仓库mod信息")
-            return
+        # 优先使用常驻服务，未启动时本地解析
+        # 是否启动只检测一次，本机连接被拒绝在Windows上要等待约2秒，不能每次解析都尝试
+        if self.daemon_available is None:
+            self.daemon_available = kk_daemon.is_daemon_running()
+        daemon_result = None
+        if self.daemon_available:
+            try:
+                daemon_result = kk_daemon.query_missing_mods(self.card_path, self.card_type.name,
+                                                             self.mod_repository_path, self.mod_game_path,
+                                                             self.plugins_path or None)
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"解析过程中出现错误: {str(e)}")
+                return
+            if daemon_result is None:
+                # 服务已停止或超时，下次解析时重新检测
+                self.daemon_available = None
+
+        if daemon_result is None:
+            try:
+                if self.mod_repository_data_cache is None:
+                    self.set_repository_data(self.load_mod_repository_json_file())
+            except:
+                QMessageBox.critical(self, "错误", "请先生成仓库mod信息")
+                return
+
+            try:
+                if self.mod_game_data_cache is None:
+                    self.mod_game_data_cache = self.load_mod_game_json_file()
+            except:
+                QMessageBox.critical(self, "错误", "请先生成仓库mod信息")
+                return
 
         try:
-            card_mod_info = kk_core.get_card_mod_info(self.card_path, self.card_type)
-            self.current_card_mod_map = {}
-            for mod in card_mod_info:
-                mod = mod.strip(" !$'\"")
-                if mod in self.mod_game_data_cache:
-                    self.current_card_mod_map[mod] = self.mod_game_data_cache[mod]['mod_dir']
-                else:
-                    self.current_card_mod_map[mod] = "当前mod在游戏中不存在"
-            missing_mod_set = self.current_card_mod_map.keys() - self.mod_game_data_cache.keys()
-            self.missing_mod_map = {}
-            missing_mod_flag = False
-            if len(missing_mod_set) == 0:
+            if daemon_result is None:
+                card_mod_info, kkex_keys = kk_core.get_card_mod_and_plugin_info(self.card_path, self.card_type)
+                analyzer = kk_core.ModAnalyzer(self.mod_game_data_cache, self.mod_repository_data_cache,
+                                               self.mod_game_path, self.mod_repository_path)
+                self.mod_records = analyzer.analyze(card_mod_info)
+                plugin_result = self.check_plugins_for_analysis(kkex_keys)
+            else:
+                self.mod_records = [kk_core.ModRecord.from_dict(data) for data in daemon_result['mods']]
+                plugin_result = {p['key']: (p['status'], p['detail']) for p in daemon_result.get('plugins') or []}
+            self.plugin_issues = kk_plugin_index.get_plugin_issues(plugin_result)
+            self.update_load_cost_label()
+            missing_records = self.get_missing_records()
+            if len(missing_records) == 0 and not self.plugin_issues:
                 self.logger.info("当前卡片在本游戏mod资源中无缺失")
                 self.show_current_card_mod_info()
                 QMessageBox.information(self, "success", "当前卡片在本游戏mod资源中无缺失")
             else:
-                for mod in missing_mod_set:
-                    if mod in self.mod_repository_data_cache:
-                        self.missing_mod_map[mod] = self.mod_repository_data_cache.get(mod)['mod_dir']
-                    else:
-                        self.missing_mod_map[mod] = "Not Found"
-                        missing_mod_flag = True
-                # 将结果渲染到列表中
-                self.clear_table()
-                for mod, mod_dir in self.missing_mod_map.items():
-                    self.add_result_item(mod, mod_dir)
-
-                if missing_mod_flag:
+                # 将结果渲染到列表中，缺少的插件显示在缺失mod之后
+                self.show_missing_rows(missing_records)
+
+                if self.plugin_issues:
+                    self.logger.info("当前卡片有%s个插件未安装或版本过旧", len(self.plugin_issues))
+                    QMessageBox.warning(self, "提示", f"当前卡片有{len(self.plugin_issues)}个插件未安装或版本过旧")
+                if any(record.status == kk_core.ModStatus.NOT_FOUND for record in missing_records):
                     self.logger.info("仓库中存在当前卡片不存在的mod，请更新仓库mod信息")
                     QMessageBox.warning(self, "提示", "仓库中存在当前卡片不存在的mod，请更新仓库mod信息")
         except Exception as e:
@@ -427,6 +623,7 @@ class ImageAnalyzerApp(QMainWindow):
             data = {
                 "mod_repository_path": self.mod_repository_path,
                 "mod_game_path": self.mod_game_path,
+                "plugins_path": self.plugins_path,
                 "save_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())  # 这里可以添加时间戳
             }
 
@@ -457,6 +654,9 @@ class ImageAnalyzerApp(QMainWindow):
                     self.mod_game_path = config_data["mod_game_path"]
                     self.label_folder2.setText(f'游戏mod路径: {self.mod_game_path}')
 
+                if config_data.get("plugins_path") and os.path.exists(config_data["plugins_path"]):
+                    self.plugins_path = config_data["plugins_path"]
+
                 self.logger.info("配置文件加载成功")
             else:
                 self.logger.info("配置文件不存在，跳过加载")
@@ -466,20 +666,42 @@ class ImageAnalyzerApp(QMainWindow):
             pass
 
     def cp_mod(self):
-        if len(self.missing_mod_map) == 0:
+        missing_records = self.get_missing_records()
+        if len(missing_records) == 0:
             QMessageBox.warning(self, "提示", "不存在缺失mod需要复制")
             return
-        unknown_mod = {}
-        for mod, mod_dir in self.missing_mod_map.items():
-            if "Not Found" == mod_dir:
-                unknown_mod[mod] = mod_dir
+        unknown_mod = []
+        for record in missing_records:
+            if record.status == kk_core.ModStatus.NOT_FOUND:
+                unknown_mod.append(record.guid)
             else:
-                source_path = os.path.join(self.mod_repository_path, mod_dir)
-                target_path = os.path.join(self.mod_game_path, mod_dir)
-                self.copy_file_with_dirs(source_path, target_path)
+                target_path = os.path.join(self.mod_game_path, record.mod_dir)
+                self.copy_file_with_dirs(record.path, target_path)
         if len(unknown_mod) > 0:
             QMessageBox.warning(self, "提示", "存在仓库无法匹配的mod，请手动确认")
 
+    def export_mod_pack(self):
+        """导出当前卡片和它用到的所有mod"""
+        if len(self.mod_records) == 0:
+            QMessageBox.warning(self, "提示", "请选择卡片")
+            return
+        default_name = os.path.splitext(os.path.basename(self.card_path))[0] + ".modpack.zip"
+        archive_path, _ = QFileDialog.getSaveFileName(self, "导出mod包", default_name, "zip文件 (*.zip)")
+        if not archive_path:
+            return
+        try:
+            mod_sources = kk_mod_pack.resolve_mod_sources(self.mod_records, self.mod_repository_path,
+                                                          self.mod_repository_data_cache)
+            manifest = kk_mod_pack.export_mod_pack(self.card_path, mod_sources, archive_path)
+        except Exception as e:
+            self.logger.info("mod包导出失败：%s", e)
+            QMessageBox.critical(self, "错误", f"mod包导出失败: {str(e)}")
+            return
+        if manifest["unresolved"]:
+            QMessageBox.warning(self, "提示", f"mod包已导出，{len(manifest['unresolved'])}个mod未找到，请手动确认")
+        else:
+            QMessageBox.information(self, "success", f"mod包已导出，共{len(manifest['mods'])}个mod")
+
     def copy_file_with_dirs(self, source_path, target_path):
         if os.path.exists(target_path):
             self.logger.info("{} exists".format(target_path))
@@ -489,24 +711,124 @@ class ImageAnalyzerApp(QMainWindow):
             os.makedirs(dest_dir)
         shutil.copy(source_path, target_path)
 
+    def get_missing_records(self):
+        return [record for record in self.mod_records if record.status != kk_core.ModStatus.INSTALLED]
+
     def show_current_card_mod_info(self):
-        if len(self.current_card_mod_map) == 0:
+        if len(self.mod_records) == 0:
             QMessageBox.warning(self, "提示", "请选择卡片")
             return
-        self.clear_table()
-        for mod, mod_dir in self.current_card_mod_map.items():
-            self.add_result_item(mod, mod_dir)
+        self.fill_table((r.guid, r.game_text, r.cost) for r in self.mod_records)
 
     def show_current_card_missing_mod_info(self):
-        if len(self.missing_mod_map) == 0:
+        missing_records = self.get_missing_records()
+        if len(missing_records) == 0 and not self.plugin_issues:
             if self.card_path == '':
                 QMessageBox.warning(self, "提示", "请选择卡片")
             else:
                 QMessageBox.warning(self, "提示", "当前人物卡暂无缺失mod")
             return
-        self.clear_table()
-        for mod, mod_dir in self.missing_mod_map.items():
-            self.add_result_item(mod, mod_dir)
+        self.show_missing_rows(missing_records)
+
+    def show_missing_rows(self, missing_records):
+        """缺失mod和未安装或过旧的插件"""
+        rows = [(r.guid, r.repository_text, r.cost) for r in missing_records]
+        rows.extend((f"[插件] {key}", f"{status}: {detail}", None)
+                    for key, (status, detail) in sorted(self.plugin_issues.items()))
+        self.fill_table(rows)
+
+    def search_mod(self):
+        """输入变化时从第一页开始搜索"""
+        self.search_page = 0
+        self.show_search_page()
+
+    def search_prev_page(self):
+        if self.search_page > 0:
+            self.search_page -= 1
+            self.show_search_page()
+
+    def search_next_page(self):
+        if self.btn_search_next.isEnabled():
+            self.search_page += 1
+            self.show_search_page()
+
+    def show_search_page(self):
+        query = self.search_input.text().strip()
+        if not query:
+            self.label_search_page.setText('')
+            return
+        if self.mod_search_index is None:
+            if self.mod_repository_data_cache is None and not self.search_index_building:
+                try:
+                    self.set_repository_data(self.load_mod_repository_json_file())
+                except Exception:
+                    self.label_search_page.setText('请先生成仓库mod信息')
+                    return
+            # 索引建立完成后 on_search_index_ready 会重新搜索
+            self.label_search_page.setText('正在建立搜索索引...')
+            return
+        guids, has_more = self.mod_search_index.search(query, self.search_page * SEARCH_PAGE_SIZE,
+                                                       SEARCH_PAGE_SIZE)
+        self.btn_search_prev.setEnabled(self.search_page > 0)
+        self.btn_search_next.setEnabled(has_more)
+        self.label_search_page.setText(f'第{self.search_page + 1}页')
+        mod_json = self.mod_repository_data_cache
+        self.fill_table((guid, mod_json[guid]['mod_dir'], kk_core.estimate_mod_load_cost(mod_json[guid]))
+                        for guid in guids)
+
+    def update_load_cost_label(self):
+        """显示当前卡片所有mod的预估加载总量"""
+        total_cost, unknown_count = kk_core.sum_mod_load_cost(self.mod_records)
+        known_count = len(self.mod_records) - unknown_count
+        text = f'预估加载: {total_cost / MB:.2f} MB（{known_count}个mod）'
+        if unknown_count:
+            text += f'，{unknown_count}个mod无统计信息'
+        self.label_load_cost.setText(text)
+
+    def run_plugin_check(self, kkex_keys, plugins_path):
+        plugin_map = kk_plugin_index.load_plugin_map(self.mod_game_path, plugins_path)
+        min_versions = kk_plugin_index.load_min_versions(self.mod_game_path)
+        return kk_plugin_index.check_card_plugins(kkex_keys, plugin_map, min_versions)
+
+    def check_plugins_for_analysis(self, kkex_keys):
+        """解析人物卡时一并检查插件，找不到插件目录或检查失败时只记录日志，不影响mod结果"""
+        plugins_path = self.plugins_path or kk_plugin_index.find_plugins_path(self.mod_game_path)
+        if kkex_keys is None or not plugins_path:
+            return {}
+        try:
+            return self.run_plugin_check(kkex_keys, plugins_path)
+        except Exception as e:
+            self.logger.info("插件检查失败 %s：%s", plugins_path, e)
+            return {}
+
+    def show_current_card_plugin_info(self):
+        """检查卡片扩展数据对应的BepInEx插件是否安装"""
+        if self.card_path == '':
+            QMessageBox.warning(self, "提示", "请选择卡片")
+            return
+        if self.card_type != kk_core.CardType.CHARACTER:
+            QMessageBox.warning(self, "提示", "目前只支持检查人物卡的插件")
+            return
+        if not self.mod_game_path:
+            QMessageBox.warning(self, "警告", "请先选择游戏mod路径！")
+            return
+        if not self.plugins_path:
+            # 游戏mod目录不在游戏根目录下时，向上找不到 BepInEx/plugins，由用户选择
+            self.plugins_path = kk_plugin_index.find_plugins_path(self.mod_game_path) or \
+                QFileDialog.getExistingDirectory(self, '未找到BepInEx/plugins，请选择插件目录')
+            if not self.plugins_path:
+                return
+        try:
+            plugin_result = self.run_plugin_check(kk_core.get_card_kkex_keys(self.card_path), self.plugins_path)
+        except Exception as e:
+            self.logger.info("插件检查失败 %s：%s", self.plugins_path, e)
+            QMessageBox.critical(self, "错误", f"插件检查失败（插件目录 {self.plugins_path}）: {str(e)}")
+            self.plugins_path = ""
+            return
+        self.plugin_issues = kk_plugin_index.get_plugin_issues(plugin_result)
+        self.fill_table(((key, f"{status}: {detail}", None)
+                         for key, (status, detail) in sorted(plugin_result.items(), key=lambda item: item[1][0])),
+                        PLUGIN_TABLE_HEADERS)
 
     def closeEvent(self, event):
         """重写关闭事件，在程序退出前自动保存配置"""
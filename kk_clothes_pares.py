@@ -7,12 +7,28 @@ from typing import Self
 SIGNATURE = b'\x89PNG\r\n\x1a\n'
 IEND_TYPE = b'IEND'
 CHECK_KEY = b"KoiKatuClothes"
+CHARA_CHECK_KEY = b"KoiKatuChara"  # 人物卡标识，同时匹配 KoiKatuCharaSun 等
 SKIP_AFTER_IEND = 8  # 固定跳过8字节
 SKIP_AFTER_CHECK = 10  # 检测成功后再跳过10字节
 NAME_END_BYTES = b"\x28\x00\x00\xDF\x12\x00\x00"  # 卡片名结束标志
 STOP_TAG = b"<additionalAccessories"
 
 
+# 遍历PNG块直到 IEND，成功时文件指针位于 IEND 之后的卡片数据开头
+def seek_png_end(f) -> bool:
+    if f.read(8) != SIGNATURE:
+        return False
+    while True:
+        lb = f.read(4)
+        if len(lb) < 4:
+            return False
+        cl = int.from_bytes(lb, "big")
+        ct = f.read(4)
+        f.seek(cl + 4, 1)  # 跳过块数据和CRC，不读入内存
+        if ct == IEND_TYPE:
+            return True
+
+
 class KKClothData:
     def __init__(self):
         self.logger = get_logger()
@@ -27,19 +43,9 @@ class KKClothData:
     def pares_cloth_card(cls, file_path) -> Self:
         kc = cls()
         with open(file_path, 'rb') as f:
-            if f.read(8) != SIGNATURE:
+            if not seek_png_end(f):
                 return kc
-
-            # 遍历块直到 IEND
-            while True:
-                lb = f.read(4)
-                if len(lb) < 4: break
-                cl = int.from_bytes(lb, "big")
-                ct = f.read(4)
-                f.read(cl)
-                f.read(4)
-                if ct == IEND_TYPE:
-                    extra = f.read()  # 这就是你要的原始二进制！
+            extra = f.read()  # 这就是你要的原始二进制！
 
         if not extra:
             return kc
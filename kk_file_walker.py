@@ -0,0 +1,39 @@
+import os
+
+from logger_handler import get_logger
+
+logger = get_logger()
+
+
+def iter_files(root_path, suffixes, skip_dir=None):
+    """
+    基于scandir递归遍历目录，边扫描边返回指定后缀的文件
+    无法读取的目录或文件（如无权限的系统目录）只记录日志并跳过，不中断遍历
+
+    Args:
+        root_path: 根目录
+        suffixes: 小写后缀元组，如 ('.png',)
+        skip_dir: 可选，skip_dir(entry, relative_path) 返回True时不进入该目录
+
+    Yields:
+        (DirEntry, 相对根目录的路径，使用/分隔)
+    """
+    stack = [(os.path.normpath(root_path), "")]
+    while stack:
+        current, relative_dir = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError as e:
+            logger.info("目录读取失败 %s: %s", current, e)
+            continue
+        with it:
+            for entry in it:
+                relative_path = relative_dir + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if skip_dir is None or not skip_dir(entry, relative_path):
+                            stack.append((entry.path, relative_path + "/"))
+                    elif entry.name.lower().endswith(suffixes) and entry.is_file():
+                        yield entry, relative_path
+                except OSError as e:
+                    logger.info("文件读取失败 %s: %s", entry.path, e)
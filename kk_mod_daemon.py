@@ -0,0 +1,284 @@
+"""
+恋活卡片mod分析常驻服务
+常驻内存保存仓库/游戏mod索引和卡片解析缓存，通过本机HTTP提供JSON查询，
+桌面程序和命令行作为客户端调用，单次查询只剩卡片解析耗时。
+
+启动服务: python kk_mod_daemon.py serve
+查询卡片: python kk_mod_daemon.py query 卡片1.png 卡片2.png --repository 仓库路径 --game 游戏mod路径
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urllib_error
+from urllib import request as urllib_request
+
+from logger_handler import get_logger
+
+logger = get_logger()
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 17788
+MOD_FILE_NAME = "kk_mod.json"
+WATCH_INTERVAL = 2  # 索引文件变化检测间隔（秒）
+CARD_CACHE_SIZE = 512  # 卡片解析结果缓存数量
+
+# 本机请求不走系统代理
+_opener = urllib_request.build_opener(urllib_request.ProxyHandler({}))
+
+
+class CardAnalysisService:
+    """保存mod索引与卡片解析缓存，服务端和命令行本地回退共用"""
+
+    def __init__(self):
+        # 延迟导入，客户端查询时不需要加载kkloader
+        import kk_card_match_mod as kk_core
+        import kk_plugin_index
+        self.kk_core = kk_core
+        self.kk_plugin_index = kk_plugin_index
+        self.lock = threading.Lock()
+        self.index_cache = {}  # json路径 -> (mtime_ns, 数据)
+        self.card_cache = OrderedDict()  # (卡片路径, 卡片类型) -> (mtime_ns, size, (mod集合, 插件ID集合))
+
+    def load_index(self, mod_path):
+        """获取mod目录对应的索引，文件有变化时重新加载"""
+        json_path = os.path.join(mod_path, MOD_FILE_NAME)
+        mtime = os.stat(json_path).st_mtime_ns
+        with self.lock:
+            cached = self.index_cache.get(json_path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        logger.info("加载mod索引 %s，共%s个mod", json_path, len(data))
+        with self.lock:
+            self.index_cache[json_path] = (mtime, data)
+        return data
+
+    def refresh_indexes(self):
+        """检测已加载的索引文件，有变化的提前重新加载"""
+        with self.lock:
+            json_paths = list(self.index_cache)
+        for json_path in json_paths:
+            try:
+                self.load_index(os.path.dirname(json_path))
+            except Exception as e:
+                logger.info("mod索引刷新失败 %s: %s", json_path, e)
+                with self.lock:
+                    self.index_cache.pop(json_path, None)
+
+    def get_card_data(self, card_path, card_type_name):
+        """返回 (mod集合, 人物卡KKEx插件ID集合或None)"""
+        stat = os.stat(card_path)
+        key = (os.path.abspath(card_path), card_type_name)
+        with self.lock:
+            cached = self.card_cache.get(key)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                self.card_cache.move_to_end(key)
+                return cached[2]
+        if card_type_name == "AUTO":
+            card_type = self.kk_core.detect_card_type(card_path)
+            if card_type is None:
+                raise Exception("无法识别卡片类型")
+        else:
+            card_type = self.kk_core.CardType[card_type_name]
+        card_data = self.kk_core.get_card_mod_and_plugin_info(card_path, card_type)
+        with self.lock:
+            self.card_cache[key] = (stat.st_mtime_ns, stat.st_size, card_data)
+            if len(self.card_cache) > CARD_CACHE_SIZE:
+                self.card_cache.popitem(last=False)
+        return card_data
+
+    def check_plugins(self, kkex_keys, game_path, plugins_path=None):
+        """人物卡的插件检查结果，非人物卡或找不到插件目录时返回None"""
+        if kkex_keys is None:
+            return None
+        try:
+            plugin_map = self.kk_plugin_index.load_plugin_map(game_path, plugins_path)
+        except Exception as e:
+            logger.info("插件检查失败：%s", e)
+            return None
+        plugin_result = self.kk_plugin_index.check_card_plugins(kkex_keys, plugin_map,
+                                                                self.kk_plugin_index.load_min_versions(game_path))
+        return [{"key": key, "status": status, "detail": detail}
+                for key, (status, detail) in sorted(plugin_result.items())]
+
+    def get_analyzer(self, repository_path, game_path):
+        return self.kk_core.ModAnalyzer(self.load_index(game_path), self.load_index(repository_path),
+                                        game_path, repository_path)
+
+    def analyze(self, card_path, card_type_name, repository_path, game_path, plugins_path=None):
+        analyzer = self.get_analyzer(repository_path, game_path)
+        mod_set, kkex_keys = self.get_card_data(card_path, card_type_name)
+        records = analyzer.analyze(mod_set)
+        return {"mods": [record.to_dict() for record in records], "plugins": self.check_plugins(kkex_keys, game_path, plugins_path)}
+
+    def analyze_batch(self, card_paths, card_type_name, repository_path, game_path, plugins_path=None):
+        analyzer = self.get_analyzer(repository_path, game_path)
+        results = {}
+        card_mod_sets = {}
+        card_kkex_keys = {}
+        for card_path in card_paths:
+            try:
+                card_mod_sets[card_path], card_kkex_keys[card_path] = self.get_card_data(card_path, card_type_name)
+            except Exception as e:
+                results[card_path] = {"error": str(e)}
+        # 所有卡片的mod合并后一次比对
+        for card_path, records in analyzer.analyze_batch(card_mod_sets).items():
+            results[card_path] = {"mods": [record.to_dict() for record in records],
+                                  "plugins": self.check_plugins(card_kkex_keys[card_path], game_path,
+                                                                plugins_path)}
+        return {"results": {card_path: results[card_path] for card_path in card_paths}}
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    service: CardAnalysisService = None
+
+    def log_message(self, format, *args):
+        logger.debug("daemon %s", format % args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def check_request(self, require_json=False):
+        """
+        只接受本机地址的请求，防止网页通过DNS重绑定读取结果
+        POST必须为application/json，网页无法不经预检直接发送这类跨域请求
+        """
+        port = self.server.server_address[1]
+        if self.headers.get("Host") not in (f"127.0.0.1:{port}", f"localhost:{port}"):
+            self.send_json(403, {"error": "invalid host"})
+            return False
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if require_json and content_type != "application/json":
+            self.send_json(415, {"error": "Content-Type must be application/json"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.check_request():
+            return
+        if self.path == "/ping":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "unknown path"})
+
+    def do_POST(self):
+        if not self.check_request(require_json=True):
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            card_type_name = params.get("card_type", "AUTO")
+            if self.path == "/missing":
+                result = self.service.analyze(params["card_path"], card_type_name, params["repository_path"],
+                                              params["game_path"], params.get("plugins_path"))
+            elif self.path == "/batch":
+                result = self.service.analyze_batch(params["card_paths"], card_type_name, params["repository_path"],
+                                                    params["game_path"], params.get("plugins_path"))
+            else:
+                self.send_json(404, {"error": "unknown path"})
+                return
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"请求参数错误: {e}"})
+            return
+        except Exception as e:
+            logger.info("daemon查询失败：%s", e)
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, result)
+
+
+def _watch_indexes(service, stop_event):
+    while not stop_event.wait(WATCH_INTERVAL):
+        service.refresh_indexes()
+
+
+def serve(host=DAEMON_HOST, port=DAEMON_PORT):
+    service = CardAnalysisService()
+    handler = type("BoundDaemonRequestHandler", (DaemonRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    stop_event = threading.Event()
+    threading.Thread(target=_watch_indexes, args=(service, stop_event), daemon=True).start()
+    logger.info("mod分析服务已启动 http://%s:%s", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+        logger.info("mod分析服务已停止")
+
+
+def _post(path, params, host=DAEMON_HOST, port=DAEMON_PORT, timeout=30):
+    """请求常驻服务，服务未启动时返回None"""
+    body = json.dumps(params, ensure_ascii=False).encode("utf-8")
+    req = urllib_request.Request(f"http://{host}:{port}{path}", data=body,
+                                 headers={"Content-Type": "application/json; charset=utf-8"})
+    try:
+        with _opener.open(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib_error.HTTPError as e:
+        raise Exception(json.loads(e.read()).get("error", str(e)))
+    except (urllib_error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def is_daemon_running(host=DAEMON_HOST, port=DAEMON_PORT):
+    try:
+        with _opener.open(f"http://{host}:{port}/ping", timeout=0.5) as resp:
+            return resp.status == 200
+    except (urllib_error.URLError, ConnectionError, TimeoutError):
+        return False
+
+
+# 客户端：查询单张卡片的mod、缺失mod和插件，服务未启动或超时返回None
+def query_missing_mods(card_path, card_type_name, repository_path, game_path, plugins_path=None):
+    return _post("/missing", {"card_path": card_path, "card_type": card_type_name,
+                              "repository_path": repository_path, "game_path": game_path,
+                              "plugins_path": plugins_path})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="恋活卡片mod分析常驻服务")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    sub_parsers = parser.add_subparsers(dest="command", required=True)
+    sub_parsers.add_parser("serve", help="启动常驻服务")
+    query_parser = sub_parsers.add_parser("query", help="查询卡片缺失mod")
+    query_parser.add_argument("cards", nargs="+", help="卡片路径")
+    query_parser.add_argument("--repository", required=True, help="mod仓库路径")
+    query_parser.add_argument("--game", required=True, help="游戏mod路径")
+    query_parser.add_argument("--type", default="AUTO", help="卡片类型 AUTO/CHARACTER/CLOTHES/SCENE，默认自动识别")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+        return
+
+    result = _post("/batch", {"card_paths": args.cards, "card_type": args.type,
+                              "repository_path": args.repository, "game_path": args.game},
+                   args.host, args.port)
+    if result is None:
+        logger.info("mod分析服务未启动，使用本地解析")
+        try:
+            result = CardAnalysisService().analyze_batch(args.cards, args.type, args.repository, args.game)
+        except Exception as e:
+            logger.info("本地解析失败：%s", e)
+            sys.exit(1)
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=4)
+    print()
+
+
+if __name__ == '__main__':
+    main()
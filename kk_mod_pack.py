@@ -0,0 +1,133 @@
+"""
+卡片mod包导出与安装
+把卡片和卡片用到的所有zipmod打包成一个zip，zipmod本身已压缩，直接存储不再压缩。
+清单文件放在包的最前面，安装时按包内顺序读取一遍即可。
+
+python kk_mod_pack.py install mod包.zip 游戏mod路径
+"""
+
+import argparse
+import json
+import os
+import shutil
+import zipfile
+
+from logger_handler import get_logger
+
+logger = get_logger()
+
+MANIFEST_NAME = "kk_mod_pack.json"
+CARD_DIR = "card"
+MOD_DIR = "mods"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def resolve_mod_sources(mod_records, repository_path, repository_mod_json=None):
+    """
+    解析卡片每个mod的本地文件，优先使用仓库中的zipmod，仓库没有时使用游戏中的zipmod
+
+    Args:
+        mod_records: ModAnalyzer 的分析结果
+        repository_path: mod仓库路径
+        repository_mod_json: 仓库mod索引，用于查找游戏中已安装的mod在仓库中的位置
+
+    Returns:
+        dict: guid -> (mod_dir, 绝对路径)，无法找到的mod为None
+    """
+    import kk_card_match_mod as kk_core
+    mod_sources = {}
+    for record in mod_records:
+        if record.status == kk_core.ModStatus.INSTALLED and repository_mod_json \
+                and record.guid in repository_mod_json:
+            mod_dir = repository_mod_json[record.guid]['mod_dir']
+            mod_sources[record.guid] = (mod_dir, os.path.join(repository_path, mod_dir))
+        elif record.status == kk_core.ModStatus.NOT_FOUND:
+            mod_sources[record.guid] = None
+        else:
+            mod_sources[record.guid] = (record.mod_dir, record.path)
+    return mod_sources
+
+
+def export_mod_pack(card_path, mod_sources, archive_path):
+    """
+    导出卡片mod包，文件直接从原位置流式写入压缩包，不生成临时副本
+
+    Args:
+        card_path: 卡片路径
+        mod_sources: resolve_mod_sources 的结果
+        archive_path: 导出的zip路径
+
+    Returns:
+        dict: 写入包内的清单
+    """
+    card_arcname = f"{CARD_DIR}/{os.path.basename(card_path)}"
+    manifest = {"card": card_arcname, "mods": {}, "unresolved": []}
+    for mod, source in sorted(mod_sources.items()):
+        if source is None or not os.path.exists(source[1]):
+            manifest["unresolved"].append(mod)
+        else:
+            manifest["mods"][mod] = f"{MOD_DIR}/{source[0].replace(os.sep, '/')}"
+
+    with zipfile.ZipFile(archive_path, "w") as zf:
+        # 清单放在第一个，安装时先读到清单
+        zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=4),
+                    compress_type=zipfile.ZIP_DEFLATED)
+        zf.write(card_path, card_arcname, compress_type=zipfile.ZIP_STORED)
+        written = set()
+        for mod, arcname in manifest["mods"].items():
+            if arcname in written:
+                continue
+            written.add(arcname)
+            zf.write(mod_sources[mod][1], arcname, compress_type=zipfile.ZIP_STORED)
+    logger.info("mod包导出完成 %s，共%s个mod，%s个未找到", archive_path, len(manifest["mods"]),
+                len(manifest["unresolved"]))
+    return manifest
+
+
+def install_mod_pack(archive_path, game_mod_path):
+    """
+    安装mod包中的zipmod到游戏mod目录，已存在的文件跳过
+
+    Returns:
+        list: 新安装的mod路径（相对游戏mod目录）
+    """
+    installed = []
+    game_root = os.path.abspath(game_mod_path)
+    with zipfile.ZipFile(archive_path, "r") as zf:
+        manifest = json.loads(zf.read(MANIFEST_NAME))
+        arcname_set = set(manifest["mods"].values())
+        # 按包内偏移顺序读取，磁盘上只顺序读一遍
+        for info in sorted(zf.infolist(), key=lambda i: i.header_offset):
+            if info.filename not in arcname_set:
+                continue
+            mod_dir = info.filename[len(MOD_DIR) + 1:]
+            target_path = os.path.abspath(os.path.join(game_mod_path, *mod_dir.split("/")))
+            if os.path.commonpath([target_path, game_root]) != game_root:
+                logger.info("跳过非法路径 %s", info.filename)
+                continue
+            if os.path.exists(target_path):
+                logger.info("{} exists".format(target_path))
+                continue
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with zf.open(info) as source, open(target_path, "wb") as target:
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            installed.append(mod_dir)
+    logger.info("mod包安装完成，新安装%s个mod", len(installed))
+    if manifest["unresolved"]:
+        logger.info("mod包中缺少的mod：%s", manifest["unresolved"])
+    return installed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="卡片mod包工具")
+    sub_parsers = parser.add_subparsers(dest="command", required=True)
+    install_parser = sub_parsers.add_parser("install", help="安装mod包到游戏mod目录")
+    install_parser.add_argument("archive", help="mod包路径")
+    install_parser.add_argument("game", help="游戏mod路径")
+    args = parser.parse_args()
+    if args.command == "install":
+        install_mod_pack(args.archive, args.game)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+卡片mod配置
+每个配置是一组卡片或mod GUID。启用配置时把游戏mod目录中用不到的zipmod改名移动到 _kk_profile_disabled 目录，
+link模式下再从仓库硬链接缺少的zipmod。只改名和建硬链接，不复制文件，停用时按记录全部还原。
+移动前先写入记录，目标位置已有文件时不覆盖，中途中断也可以再次停用还原。
+游戏mod的json索引同步增删，不需要重新扫描。
+
+python kk_mod_profile.py save 配置名 --game 游戏mod路径 --cards 卡片1.png 卡片2.png
+python kk_mod_profile.py activate 配置名 --game 游戏mod路径 --repository mod仓库路径 --mode link
+python kk_mod_profile.py deactivate --game 游戏mod路径
+"""
+
+import argparse
+import json
+import os
+
+from logger_handler import get_logger
+
+logger = get_logger()
+
+MOD_FILE_NAME = "kk_mod.json"
+PROFILE_FILE_NAME = "kk_mod_profiles.json"
+PROFILE_STATE_FILE_NAME = "kk_mod_profile_state.json"
+# 本工具专用的禁用目录，与用户自己的 _disabled 目录分开，扫描mod时会跳过该目录
+DISABLED_DIR_NAME = "_kk_profile_disabled"
+
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def load_profiles(game_mod_path):
+    return _load_json(os.path.join(game_mod_path, PROFILE_FILE_NAME), {})
+
+
+def save_profile(game_mod_path, name, cards=(), guids=()):
+    profiles = load_profiles(game_mod_path)
+    profiles[name] = {"cards": [os.path.abspath(c) for c in cards], "guids": list(guids)}
+    _save_json(os.path.join(game_mod_path, PROFILE_FILE_NAME), profiles)
+    logger.info("配置%s已保存，%s张卡片，%s个mod", name, len(cards), len(guids))
+
+
+def get_active_profile(game_mod_path):
+    state = _load_json(os.path.join(game_mod_path, PROFILE_STATE_FILE_NAME), None)
+    return state["name"] if state else None
+
+
+def get_profile_guids(profile):
+    """配置需要的全部mod GUID"""
+    import kk_card_match_mod as kk_core
+    guids = {kk_core.normalize_mod_guid(guid) for guid in profile.get("guids", [])}
+    if profile.get("cards"):
+        for card_path in profile["cards"]:
+            card_type = kk_core.detect_card_type(card_path)
+            if card_type is None:
+                logger.info("无法识别卡片类型，已跳过 %s", card_path)
+                continue
+            guids.update(kk_core.normalize_mod_guid(mod) for mod in kk_core.get_card_mod_info(card_path, card_type))
+    return guids
+
+
+def _makedirs(path, created_dirs):
+    """创建目录，把新建的目录记录到 created_dirs，停用时删除"""
+    missing = []
+    while path and not os.path.isdir(path):
+        missing.append(path)
+        path = os.path.dirname(path)
+    for current in reversed(missing):
+        os.mkdir(current)
+        created_dirs.append(current)
+
+
+def _move(source, target, created_dirs):
+    """改名移动，目标已存在时不覆盖"""
+    if os.path.lexists(target):
+        raise FileExistsError(f"目标已存在 {target}")
+    _makedirs(os.path.dirname(target), created_dirs)
+    os.rename(source, target)
+
+
+def _remove_empty_dirs(path):
+    for current, _, _ in sorted(os.walk(path), key=lambda item: len(item[0]), reverse=True):
+        try:
+            os.rmdir(current)
+        except OSError:
+            pass
+
+
+def _remove_created_dirs(created_dirs):
+    """删除启用配置时新建且已为空的目录，由深到浅"""
+    for path in sorted(created_dirs, key=len, reverse=True):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def activate_profile(game_mod_path, name, repository_path=None, mode="rename"):
+    """
+    启用配置
+
+    Args:
+        game_mod_path: 游戏mod路径
+        name: 配置名
+        repository_path: mod仓库路径，link模式需要
+        mode: rename 只禁用不需要的mod / link 另外从仓库硬链接缺少的mod
+    """
+    profile = load_profiles(game_mod_path).get(name)
+    if profile is None:
+        raise Exception(f"配置{name}不存在")
+    if get_active_profile(game_mod_path):
+        deactivate_profile(game_mod_path)
+        if get_active_profile(game_mod_path):
+            raise Exception("当前配置未能完全停用，请检查日志")
+
+    required = get_profile_guids(profile)
+    game_json_path = os.path.join(game_mod_path, MOD_FILE_NAME)
+    game_mod_json = _load_json(game_json_path, None)
+    if game_mod_json is None:
+        raise Exception("请先生成游戏mod信息")
+    state_path = os.path.join(game_mod_path, PROFILE_STATE_FILE_NAME)
+    disabled_path = os.path.join(game_mod_path, DISABLED_DIR_NAME)
+
+    # 先确定全部操作并写入记录，中途中断时停用能找到已移动的文件
+    disabled = {guid: info for guid, info in game_mod_json.items() if guid not in required}
+    linked = {}
+    if mode == "link":
+        repository_mod_json = _load_json(os.path.join(repository_path, MOD_FILE_NAME), {})
+        for guid in required - game_mod_json.keys():
+            mod_info = repository_mod_json.get(guid)
+            if mod_info is not None and not os.path.lexists(os.path.join(game_mod_path, mod_info['mod_dir'])):
+                linked[guid] = mod_info
+    state = {"name": name, "mode": mode, "repository": repository_path, "disabled": disabled, "linked": linked,
+             "created_dirs": []}
+    _save_json(state_path, state)
+
+    try:
+        # 不需要的mod移到禁用目录，同一磁盘内改名，几乎不耗时
+        for guid, mod_info in list(disabled.items()):
+            try:
+                _move(os.path.join(game_mod_path, mod_info['mod_dir']),
+                      os.path.join(disabled_path, mod_info['mod_dir']), state["created_dirs"])
+            except OSError as e:
+                logger.info("mod禁用失败 %s: %s", mod_info['mod_dir'], e)
+                del disabled[guid]
+                continue
+            game_mod_json.pop(guid)
+
+        for guid, mod_info in list(linked.items()):
+            target = os.path.join(game_mod_path, mod_info['mod_dir'])
+            try:
+                _makedirs(os.path.dirname(target), state["created_dirs"])
+                os.link(os.path.join(repository_path, mod_info['mod_dir']), target)
+            except OSError as e:
+                logger.info("mod硬链接失败 %s: %s", mod_info['mod_dir'], e)
+                del linked[guid]
+                continue
+            game_mod_json[guid] = mod_info
+    finally:
+        _save_json(state_path, state)
+        _save_json(game_json_path, game_mod_json)
+    logger.info("配置%s已启用，禁用%s个mod，链接%s个mod", name, len(disabled), len(linked))
+    return state
+
+
+def _is_profile_link(target, source):
+    """目标是本工具建立的硬链接（与仓库文件为同一文件）"""
+    try:
+        return os.path.samefile(target, source)
+    except OSError:
+        return False
+
+
+def deactivate_profile(game_mod_path):
+    """停用当前配置，删除硬链接并把禁用的mod移回原位置，原位置已有文件时保留禁用目录中的文件"""
+    state_path = os.path.join(game_mod_path, PROFILE_STATE_FILE_NAME)
+    state = _load_json(state_path, None)
+    if state is None:
+        logger.info("当前没有启用的配置")
+        return
+    game_json_path = os.path.join(game_mod_path, MOD_FILE_NAME)
+    game_mod_json = _load_json(game_json_path, {})
+    disabled_path = os.path.join(game_mod_path, DISABLED_DIR_NAME)
+    created_dirs = state.get("created_dirs", [])
+
+    try:
+        for guid, mod_info in list(state["linked"].items()):
+            target = os.path.join(game_mod_path, mod_info['mod_dir'])
+            try:
+                # 只删除本工具建立的硬链接，不删除之后放到该位置的其他文件
+                if _is_profile_link(target, os.path.join(state["repository"] or "", mod_info['mod_dir'])):
+                    os.remove(target)
+                elif os.path.lexists(target):
+                    logger.info("硬链接位置已被其他文件占用，保留 %s", mod_info['mod_dir'])
+            except OSError as e:
+                logger.info("硬链接删除失败 %s: %s", mod_info['mod_dir'], e)
+                continue
+            game_mod_json.pop(guid, None)
+            del state["linked"][guid]
+
+        for guid, mod_info in list(state["disabled"].items()):
+            source = os.path.join(disabled_path, mod_info['mod_dir'])
+            target = os.path.join(game_mod_path, mod_info['mod_dir'])
+            if not os.path.lexists(source):
+                if os.path.lexists(target):
+                    # 启用时中断，尚未移动
+                    game_mod_json[guid] = mod_info
+                else:
+                    logger.info("禁用目录中的mod已不存在，跳过 %s", mod_info['mod_dir'])
+                del state["disabled"][guid]
+                continue
+            try:
+                _move(source, target, [])
+            except OSError as e:
+                logger.info("mod还原失败 %s: %s", mod_info['mod_dir'], e)
+                continue
+            game_mod_json[guid] = mod_info
+            del state["disabled"][guid]
+    finally:
+        _save_json(game_json_path, game_mod_json)
+        if state["linked"] or state["disabled"]:
+            # 还有未还原的mod，保留记录以便再次停用
+            _save_json(state_path, state)
+        else:
+            os.remove(state_path)
+            _remove_created_dirs(created_dirs)
+    _remove_empty_dirs(disabled_path)
+    logger.info("配置%s已停用", state["name"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按卡片切换游戏mod")
+    parser.add_argument("--game", required=True, help="游戏mod路径")
+    sub_parsers = parser.add_subparsers(dest="command", required=True)
+    save_parser = sub_parsers.add_parser("save", help="保存配置")
+    save_parser.add_argument("name")
+    save_parser.add_argument("--cards", nargs="*", default=[], help="卡片路径")
+    save_parser.add_argument("--guids", nargs="*", default=[], help="mod GUID")
+    activate_parser = sub_parsers.add_parser("activate", help="启用配置")
+    activate_parser.add_argument("name")
+    activate_parser.add_argument("--repository", default=None, help="mod仓库路径，link模式需要")
+    activate_parser.add_argument("--mode", choices=["rename", "link"], default="rename")
+    sub_parsers.add_parser("deactivate", help="停用当前配置")
+    sub_parsers.add_parser("list", help="列出配置")
+    args = parser.parse_args()
+
+    if args.command == "save":
+        save_profile(args.game, args.name, args.cards, args.guids)
+    elif args.command == "activate":
+        if args.mode == "link" and not args.repository:
+            parser.error("link模式需要 --repository")
+        activate_profile(args.game, args.name, args.repository, args.mode)
+    elif args.command == "deactivate":
+        deactivate_profile(args.game)
+    else:
+        active = get_active_profile(args.game)
+        for name, profile in load_profiles(args.game).items():
+            flag = "*" if name == active else " "
+            print(f"{flag} {name}: {len(profile['cards'])}张卡片，{len(profile['guids'])}个mod")
+
+
+if __name__ == '__main__':
+    main()
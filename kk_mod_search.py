@@ -0,0 +1,57 @@
+import re
+from bisect import bisect_left
+
+TOKEN_SPLIT_PATTERN = re.compile(r"[\s._\-/\\\[\]()]+")
+
+
+class ModSearchIndex:
+    """
+    mod索引的前缀搜索，GUID、名称、路径及其中的每个单词都按前缀匹配
+    预先排好序，每次查询只做二分查找
+    """
+
+    def __init__(self, mod_json):
+        self.guids = list(mod_json)
+        self.texts = []
+        entries = []
+        for guid_id, guid in enumerate(self.guids):
+            info = mod_json[guid]
+            fields = [guid, info.get('name') or '', (info.get('mod_dir') or '').replace('\\', '/')]
+            text = "\n".join(fields).lower()
+            self.texts.append(text)
+            keys = set(fields)
+            for field in fields:
+                keys.update(TOKEN_SPLIT_PATTERN.split(field))
+            for key in keys:
+                if key:
+                    entries.append((key.lower(), guid_id))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [guid_id for _, guid_id in entries]
+
+    def search(self, query, offset=0, limit=100):
+        """
+        Returns:
+            (当前页的GUID列表, 是否还有下一页)
+        """
+        words = [word for word in TOKEN_SPLIT_PATTERN.split(query.lower()) if word]
+        if not words:
+            return [], False
+        # 用最长的关键词做前缀查找，匹配范围最小
+        first = max(words, key=len)
+        others = [word for word in words if word is not first]
+        wanted = offset + limit + 1
+        seen = set()
+        matched = []
+        i = bisect_left(self.keys, first)
+        while i < len(self.keys) and self.keys[i].startswith(first) and len(matched) < wanted:
+            guid_id = self.ids[i]
+            i += 1
+            if guid_id in seen:
+                continue
+            seen.add(guid_id)
+            # 多个关键词时其余关键词在GUID、名称、路径中出现即可
+            if all(word in self.texts[guid_id] for word in others):
+                matched.append(guid_id)
+        page = [self.guids[guid_id] for guid_id in matched[offset:offset + limit]]
+        return page, len(matched) > offset + limit
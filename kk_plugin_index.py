@@ -0,0 +1,401 @@
+"""
+BepInEx插件索引
+读取 BepInEx/plugins 下dll的.NET元数据，取出 [BepInPlugin(GUID, Name, Version)] 特性，生成 插件GUID -> 版本 的索引，
+按 路径+大小+修改时间 增量更新。卡片 KKEx 的顶层key即写入数据的插件ID，用索引检查插件是否安装。
+插件最低版本在游戏mod目录下的 kk_plugin_min_versions.json 中按 插件GUID -> 版本号 配置，低于该版本时报告过旧。
+"""
+
+import json
+import os
+import struct
+import threading
+
+from kk_file_walker import iter_files
+from logger_handler import get_logger
+
+logger = get_logger()
+
+PLUGIN_INDEX_FILE_NAME = "kk_plugin.json"
+PLUGIN_MIN_VERSION_FILE_NAME = "kk_plugin_min_versions.json"
+PLUGIN_ATTRIBUTE_NAME = b"BepInPlugin"
+
+# KKEx数据ID与插件GUID不同的插件
+KKEX_PLUGIN_ALIASES = {
+    "com.bepis.sideloader.universalautoresolver": "com.bepis.bepinex.sideloader",
+    "KKABMPlugin.ABMData": "KKABMX.Core",
+}
+# 内置的插件最低版本要求，低于该版本视为过旧，kk_plugin_min_versions.json 中的配置优先
+PLUGIN_MIN_VERSIONS = {}
+
+# 插件目录 -> (目录修改时间签名, 插件映射)，目录未变化时不重新扫描
+_plugin_map_cache = {}
+_plugin_map_lock = threading.Lock()
+
+PLUGIN_INSTALLED = "已安装"
+PLUGIN_MISSING = "插件未安装"
+PLUGIN_OUTDATED = "插件版本过旧"
+
+# ========== .NET 元数据表 ==========
+TABLE_MODULE = 0x00
+TABLE_TYPE_REF = 0x01
+TABLE_TYPE_DEF = 0x02
+TABLE_FIELD_PTR = 0x03
+TABLE_FIELD = 0x04
+TABLE_METHOD_PTR = 0x05
+TABLE_METHOD_DEF = 0x06
+TABLE_PARAM_PTR = 0x07
+TABLE_PARAM = 0x08
+TABLE_INTERFACE_IMPL = 0x09
+TABLE_MEMBER_REF = 0x0A
+TABLE_CONSTANT = 0x0B
+TABLE_CUSTOM_ATTRIBUTE = 0x0C
+TABLE_DECL_SECURITY = 0x0E
+TABLE_STAND_ALONE_SIG = 0x11
+TABLE_EVENT = 0x14
+TABLE_PROPERTY = 0x17
+TABLE_MODULE_REF = 0x1A
+TABLE_TYPE_SPEC = 0x1B
+TABLE_ASSEMBLY = 0x20
+TABLE_ASSEMBLY_REF = 0x23
+TABLE_FILE = 0x26
+TABLE_EXPORTED_TYPE = 0x27
+TABLE_MANIFEST_RESOURCE = 0x28
+TABLE_GENERIC_PARAM = 0x2A
+TABLE_METHOD_SPEC = 0x2B
+TABLE_GENERIC_PARAM_CONSTRAINT = 0x2C
+
+CODED_RESOLUTION_SCOPE = ([TABLE_MODULE, TABLE_MODULE_REF, TABLE_ASSEMBLY_REF, TABLE_TYPE_REF], 2)
+CODED_TYPE_DEF_OR_REF = ([TABLE_TYPE_DEF, TABLE_TYPE_REF, TABLE_TYPE_SPEC], 2)
+CODED_MEMBER_REF_PARENT = ([TABLE_TYPE_DEF, TABLE_TYPE_REF, TABLE_MODULE_REF, TABLE_METHOD_DEF, TABLE_TYPE_SPEC], 3)
+CODED_HAS_CONSTANT = ([TABLE_FIELD, TABLE_PARAM, TABLE_PROPERTY], 2)
+CODED_CUSTOM_ATTRIBUTE_TYPE = ([TABLE_METHOD_DEF, TABLE_MEMBER_REF], 3)
+CODED_HAS_CUSTOM_ATTRIBUTE = ([TABLE_METHOD_DEF, TABLE_FIELD, TABLE_TYPE_REF, TABLE_TYPE_DEF, TABLE_PARAM,
+                               TABLE_INTERFACE_IMPL, TABLE_MEMBER_REF, TABLE_MODULE, TABLE_DECL_SECURITY,
+                               TABLE_PROPERTY, TABLE_EVENT, TABLE_STAND_ALONE_SIG, TABLE_MODULE_REF,
+                               TABLE_TYPE_SPEC, TABLE_ASSEMBLY, TABLE_ASSEMBLY_REF, TABLE_FILE,
+                               TABLE_EXPORTED_TYPE, TABLE_MANIFEST_RESOURCE, TABLE_GENERIC_PARAM,
+                               TABLE_GENERIC_PARAM_CONSTRAINT, TABLE_METHOD_SPEC], 5)
+MEMBER_REF_PARENT_TYPE_REF = 1
+CUSTOM_ATTRIBUTE_TYPE_MEMBER_REF = 3
+
+
+class _MetadataReader:
+    """只解析读取 CustomAttribute 所需的元数据表"""
+
+    def __init__(self, data):
+        self.data = data
+        metadata_offset = self._find_metadata()
+        self.streams = self._read_stream_headers(metadata_offset)
+        self._read_table_header()
+
+    def _find_metadata(self):
+        data = self.data
+        if data[:2] != b"MZ":
+            raise ValueError("不是PE文件")
+        pe_offset = struct.unpack_from("<I", data, 0x3C)[0]
+        if data[pe_offset:pe_offset + 4] != b"PE\0\0":
+            raise ValueError("不是PE文件")
+        section_count, = struct.unpack_from("<H", data, pe_offset + 6)
+        optional_size, = struct.unpack_from("<H", data, pe_offset + 20)
+        optional_offset = pe_offset + 24
+        magic, = struct.unpack_from("<H", data, optional_offset)
+        data_dir_offset = optional_offset + (96 if magic == 0x10B else 112)
+        cli_rva, cli_size = struct.unpack_from("<II", data, data_dir_offset + 14 * 8)
+        if cli_rva == 0:
+            raise ValueError("不是.NET程序集")
+        self.sections = []
+        section_offset = optional_offset + optional_size
+        for i in range(section_count):
+            virtual_size, virtual_address, raw_size, raw_pointer = struct.unpack_from(
+                "<IIII", data, section_offset + i * 40 + 8)
+            self.sections.append((virtual_address, max(virtual_size, raw_size), raw_pointer))
+        cli_offset = self._rva_to_offset(cli_rva)
+        metadata_rva, = struct.unpack_from("<I", data, cli_offset + 8)
+        return self._rva_to_offset(metadata_rva)
+
+    def _rva_to_offset(self, rva):
+        for virtual_address, size, raw_pointer in self.sections:
+            if virtual_address <= rva < virtual_address + size:
+                return rva - virtual_address + raw_pointer
+        raise ValueError("RVA不在任何节中")
+
+    def _read_stream_headers(self, metadata_offset):
+        data = self.data
+        if struct.unpack_from("<I", data, metadata_offset)[0] != 0x424A5342:
+            raise ValueError("元数据签名错误")
+        version_length, = struct.unpack_from("<I", data, metadata_offset + 12)
+        pos = metadata_offset + 16 + version_length + 2
+        stream_count, = struct.unpack_from("<H", data, pos)
+        pos += 2
+        streams = {}
+        for _ in range(stream_count):
+            offset, size = struct.unpack_from("<II", data, pos)
+            name_end = data.index(b"\0", pos + 8)
+            name = data[pos + 8:name_end].decode("ascii")
+            pos = (name_end + 4) & ~3  # 名称按4字节对齐
+            streams[name] = (metadata_offset + offset, size)
+        return streams
+
+    def _read_table_header(self):
+        data = self.data
+        tables_offset, _ = self.streams.get("#~") or self.streams["#-"]
+        heap_sizes = data[tables_offset + 6]
+        self.string_size = 4 if heap_sizes & 0x01 else 2
+        self.guid_size = 4 if heap_sizes & 0x02 else 2
+        self.blob_size = 4 if heap_sizes & 0x04 else 2
+        valid, = struct.unpack_from("<Q", data, tables_offset + 8)
+        pos = tables_offset + 24
+        self.row_counts = [0] * 64
+        for table in range(64):
+            if valid >> table & 1:
+                self.row_counts[table], = struct.unpack_from("<I", data, pos)
+                pos += 4
+        self.tables_start = pos
+
+    def _index_size(self, table):
+        return 2 if self.row_counts[table] < 0x10000 else 4
+
+    def _coded_size(self, coded):
+        tables, tag_bits = coded
+        max_rows = max(self.row_counts[t] for t in tables)
+        return 2 if max_rows < (1 << (16 - tag_bits)) else 4
+
+    def _row_layout(self, table):
+        """返回表每列的字节数"""
+        s, g, b = self.string_size, self.guid_size, self.blob_size
+        layouts = {
+            TABLE_MODULE: [2, s, g, g, g],
+            TABLE_TYPE_REF: [self._coded_size(CODED_RESOLUTION_SCOPE), s, s],
+            TABLE_TYPE_DEF: [4, s, s, self._coded_size(CODED_TYPE_DEF_OR_REF), self._index_size(TABLE_FIELD),
+                             self._index_size(TABLE_METHOD_DEF)],
+            TABLE_FIELD_PTR: [self._index_size(TABLE_FIELD)],
+            TABLE_FIELD: [2, s, b],
+            TABLE_METHOD_PTR: [self._index_size(TABLE_METHOD_DEF)],
+            TABLE_METHOD_DEF: [4, 2, 2, s, b, self._index_size(TABLE_PARAM)],
+            TABLE_PARAM_PTR: [self._index_size(TABLE_PARAM)],
+            TABLE_PARAM: [2, 2, s],
+            TABLE_INTERFACE_IMPL: [self._index_size(TABLE_TYPE_DEF), self._coded_size(CODED_TYPE_DEF_OR_REF)],
+            TABLE_MEMBER_REF: [self._coded_size(CODED_MEMBER_REF_PARENT), s, b],
+            TABLE_CONSTANT: [2, self._coded_size(CODED_HAS_CONSTANT), b],
+            TABLE_CUSTOM_ATTRIBUTE: [self._coded_size(CODED_HAS_CUSTOM_ATTRIBUTE),
+                                     self._coded_size(CODED_CUSTOM_ATTRIBUTE_TYPE), b],
+        }
+        return layouts[table]
+
+    def _table_offset(self, table):
+        offset = self.tables_start
+        for t in range(table):
+            if self.row_counts[t]:
+                offset += sum(self._row_layout(t)) * self.row_counts[t]
+        return offset
+
+    def read_rows(self, table):
+        layout = self._row_layout(table)
+        row_size = sum(layout)
+        offset = self._table_offset(table)
+        formats = {2: "H", 4: "I"}
+        row_format = "<" + "".join(formats[size] for size in layout)
+        for i in range(self.row_counts[table]):
+            yield struct.unpack_from(row_format, self.data, offset + i * row_size)
+
+    def read_string(self, index):
+        offset = self.streams["#Strings"][0] + index
+        return self.data[offset:self.data.index(b"\0", offset)]
+
+    def read_blob(self, index):
+        pos = self.streams["#Blob"][0] + index
+        length, pos = _read_compressed_uint(self.data, pos)
+        return self.data[pos:pos + length]
+
+
+def _read_compressed_uint(data, pos):
+    first = data[pos]
+    if first & 0x80 == 0:
+        return first, pos + 1
+    if first & 0xC0 == 0x80:
+        return (first & 0x3F) << 8 | data[pos + 1], pos + 2
+    return (first & 0x1F) << 24 | data[pos + 1] << 16 | data[pos + 2] << 8 | data[pos + 3], pos + 4
+
+
+def _read_ser_strings(blob, count):
+    """读取特性参数中的字符串，blob以 0x0001 开头"""
+    if blob[:2] != b"\x01\x00":
+        return None
+    values = []
+    pos = 2
+    for _ in range(count):
+        if blob[pos] == 0xFF:
+            values.append(None)
+            pos += 1
+            continue
+        length, pos = _read_compressed_uint(blob, pos)
+        values.append(blob[pos:pos + length].decode("utf-8"))
+        pos += length
+    return values
+
+
+def read_bepinex_plugins(dll_path):
+    """
+    读取dll中所有 [BepInPlugin] 特性
+
+    Returns:
+        list: [{"guid": ..., "name": ..., "version": ...}]，非.NET程序集返回空列表
+    """
+    with open(dll_path, "rb") as f:
+        data = f.read()
+    if PLUGIN_ATTRIBUTE_NAME not in data:
+        return []
+    try:
+        reader = _MetadataReader(data)
+        member_refs = list(reader.read_rows(TABLE_MEMBER_REF))
+        type_refs = list(reader.read_rows(TABLE_TYPE_REF))
+        plugins = []
+        for _, attribute_type, value in reader.read_rows(TABLE_CUSTOM_ATTRIBUTE):
+            if attribute_type & 0x7 != CUSTOM_ATTRIBUTE_TYPE_MEMBER_REF:
+                continue
+            parent, _, _ = member_refs[(attribute_type >> 3) - 1]
+            if parent & 0x7 != MEMBER_REF_PARENT_TYPE_REF:
+                continue
+            _, type_name, _ = type_refs[(parent >> 3) - 1]
+            if reader.read_string(type_name) != b"BepInPlugin":
+                continue
+            args = _read_ser_strings(reader.read_blob(value), 3)
+            if args and args[0]:
+                plugins.append({"guid": args[0], "name": args[1], "version": args[2]})
+        return plugins
+    except (ValueError, IndexError, KeyError, struct.error, UnicodeDecodeError) as e:
+        logger.info("插件元数据读取失败 %s: %s", dll_path, e)
+        return []
+
+
+def find_plugins_path(game_mod_path):
+    """从游戏mod目录逐级向上查找 BepInEx/plugins，找不到时返回None"""
+    current = os.path.abspath(game_mod_path)
+    while True:
+        plugins_path = os.path.join(current, "BepInEx", "plugins")
+        if os.path.isdir(plugins_path):
+            return plugins_path
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def generate_plugin_index(plugins_path, index_path):
+    """扫描插件目录生成索引，大小和修改时间未变化的dll复用旧数据"""
+    old_index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                old_index = json.load(f)
+        except Exception as e:
+            logger.info("旧插件索引读取失败，将全量扫描：%s", e)
+    root = os.path.normpath(plugins_path)
+    index = {}
+    for entry, dll_dir in iter_files(root, (".dll",)):
+        dll_dir = dll_dir.replace("/", os.sep)
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.info("插件读取失败 %s: %s", entry.path, e)
+            continue
+        old = old_index.get(dll_dir)
+        if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime_ns:
+            index[dll_dir] = old
+        else:
+            index[dll_dir] = {"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                              "plugins": read_bepinex_plugins(entry.path)}
+    logger.info("本次共扫描%s个插件dll", len(index))
+    if index != old_index or not os.path.exists(index_path):
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=4, ensure_ascii=False)
+    return index
+
+
+def _get_plugins_dir_signature(plugins_path):
+    """插件目录及其直接子目录的修改时间，安装、删除、替换插件时会变化"""
+    signature = [(plugins_path, os.stat(plugins_path).st_mtime_ns)]
+    with os.scandir(plugins_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                signature.append((entry.name, entry.stat(follow_symlinks=False).st_mtime_ns))
+    return sorted(signature)
+
+
+def load_plugin_map(game_mod_path, plugins_path=None):
+    """
+    加载（必要时更新）插件索引，返回 插件GUID -> {"name", "version", "dll"}
+
+    Args:
+        game_mod_path: 游戏mod路径，索引文件保存在该目录
+        plugins_path: 插件目录，默认从游戏mod目录向上查找 BepInEx/plugins
+    """
+    if plugins_path is None:
+        plugins_path = find_plugins_path(game_mod_path)
+        if plugins_path is None:
+            raise Exception("未找到BepInEx/plugins目录，请手动选择插件目录")
+    index_path = os.path.join(game_mod_path, PLUGIN_INDEX_FILE_NAME)
+    signature = _get_plugins_dir_signature(plugins_path)
+    with _plugin_map_lock:
+        cached = _plugin_map_cache.get((plugins_path, index_path))
+        if cached and cached[0] == signature:
+            return cached[1]
+    index = generate_plugin_index(plugins_path, index_path)
+    plugin_map = {}
+    for dll_dir, info in index.items():
+        for plugin in info["plugins"]:
+            plugin_map[plugin["guid"]] = {"name": plugin["name"], "version": plugin["version"], "dll": dll_dir}
+    with _plugin_map_lock:
+        _plugin_map_cache[(plugins_path, index_path)] = (signature, plugin_map)
+    return plugin_map
+
+
+def load_min_versions(game_mod_path):
+    """内置最低版本与游戏mod目录下配置文件合并，配置文件优先"""
+    min_versions = dict(PLUGIN_MIN_VERSIONS)
+    config_path = os.path.join(game_mod_path, PLUGIN_MIN_VERSION_FILE_NAME)
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                min_versions.update(json.load(f))
+        except Exception as e:
+            logger.info("插件最低版本配置读取失败 %s: %s", config_path, e)
+    return min_versions
+
+
+def get_plugin_issues(plugin_result):
+    """检查结果中未安装或过旧的插件"""
+    return {key: value for key, value in plugin_result.items() if value[0] != PLUGIN_INSTALLED}
+
+
+def _version_tuple(version):
+    return tuple(int(p) if p.isdigit() else 0 for p in (version or "0").split("."))
+
+
+def check_card_plugins(kkex_keys, plugin_map, min_versions=None):
+    """
+    检查卡片 KKEx 数据对应的插件
+
+    Args:
+        kkex_keys: 卡片 KKEx 的顶层key
+        plugin_map: load_plugin_map 的结果
+        min_versions: 插件GUID -> 最低版本，默认使用内置的 PLUGIN_MIN_VERSIONS
+
+    Returns:
+        dict: KKEx key -> (状态, 说明)
+    """
+    if min_versions is None:
+        min_versions = PLUGIN_MIN_VERSIONS
+    result = {}
+    for key in kkex_keys:
+        guid = KKEX_PLUGIN_ALIASES.get(key, key)
+        plugin = plugin_map.get(guid)
+        if plugin is None:
+            result[key] = (PLUGIN_MISSING, guid)
+            continue
+        min_version = min_versions.get(guid)
+        if min_version and _version_tuple(plugin["version"]) < _version_tuple(min_version):
+            result[key] = (PLUGIN_OUTDATED, f"{plugin['name']} {plugin['version']} < {min_version}")
+        else:
+            result[key] = (PLUGIN_INSTALLED, f"{plugin['name']} {plugin['version']}")
+    return result
@@ -0,0 +1,105 @@
+from logger_handler import get_logger
+from kk_clothes_pares import seek_png_end
+
+import re
+from typing import Self
+
+# ========== 场景卡规则 ==========
+# 场景卡 IEND 之后是 BinaryWriter 写入的版本号字符串，例如 \x071.1.2.1
+SCENE_VERSION_PATTERN = re.compile(rb"\d+(\.\d+){1,3}")
+# 场景内人物、道具的 sideloader 解析信息都以 msgpack 的 ModID 键记录 GUID
+MOD_ID_KEY = b"\xa5ModID"
+CHUNK_SIZE = 1024 * 1024  # 每次读取1MB，内存占用与场景大小无关
+MAX_GUID_LENGTH = 1024  # 超过该长度视为误匹配
+
+
+def is_scene_header(header: bytes) -> bool:
+    """判断 IEND 之后的数据是否以场景版本号开头"""
+    if not header:
+        return False
+    length = header[0]
+    match = SCENE_VERSION_PATTERN.fullmatch(header[1:1 + length])
+    return match is not None
+
+
+def _read_msgpack_str(buf, pos):
+    """
+    读取 pos 处的 msgpack 字符串
+    Returns:
+        (字符串字节, 结束位置)；不是字符串时返回 (None, pos)；数据不完整时返回 (None, None)
+    """
+    if pos >= len(buf):
+        return None, None
+    head = buf[pos]
+    if 0xa0 <= head <= 0xbf:
+        length, start = head & 0x1f, pos + 1
+    elif head == 0xd9:
+        if pos + 2 > len(buf):
+            return None, None
+        length, start = buf[pos + 1], pos + 2
+    elif head == 0xda:
+        if pos + 3 > len(buf):
+            return None, None
+        length, start = int.from_bytes(buf[pos + 1:pos + 3], "big"), pos + 3
+    else:
+        return None, pos
+    if length > MAX_GUID_LENGTH:
+        return None, pos
+    if start + length > len(buf):
+        return None, None
+    return buf[start:start + length], start + length
+
+
+class KKSceneData:
+    def __init__(self):
+        self.logger = get_logger()
+        self.has_scene_card = False
+        self.scene_version = ""
+        self.card_mod_set = set()
+
+    def __str__(self):
+        return f"SCENE(has_scene_card:{self.has_scene_card}, scene_version:{self.scene_version}, card_mod_set:{self.card_mod_set})"
+
+    @classmethod
+    def pares_scene_card(cls, file_path) -> Self:
+        """分块扫描场景数据，收集所有人物、服装、道具的 mod GUID，不把整个场景读入内存"""
+        kc = cls()
+        with open(file_path, 'rb') as f:
+            if not seek_png_end(f):
+                return kc
+            header = f.read(1 + 16)
+            if not is_scene_header(header):
+                return kc
+            kc.has_scene_card = True
+            kc.scene_version = header[1:1 + header[0]].decode("ascii")
+
+            buf = header
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                buf += chunk
+                pos = 0
+                keep_from = None
+                while True:
+                    key_pos = buf.find(MOD_ID_KEY, pos)
+                    if key_pos == -1:
+                        break
+                    guid, end = _read_msgpack_str(buf, key_pos + len(MOD_ID_KEY))
+                    if end is None:
+                        # GUID 跨越了块边界，留到下一块继续读取
+                        keep_from = key_pos
+                        break
+                    if guid is None:
+                        pos = key_pos + 1
+                        continue
+                    guid = guid.decode("utf-8", errors="ignore")
+                    if guid:
+                        kc.card_mod_set.add(guid)
+                    pos = end
+                if not chunk:
+                    break
+                if keep_from is None:
+                    # 保留末尾可能被截断的 ModID 键
+                    keep_from = max(pos, len(buf) - len(MOD_ID_KEY) + 1)
+                buf = buf[keep_from:]
+
+        return kc
@@ -0,0 +1,166 @@
+"""
+卡片缩略图缓存
+后台线程解码并缩小卡片图片，内存中保留LRU缓存，磁盘按 路径+修改时间 缓存缩略图，避免重复解码原图。
+卡片修改后重新生成缩略图时删除该卡片的旧缓存，磁盘缓存超过上限时按最近使用时间清理。
+"""
+
+import glob
+import hashlib
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap
+
+from logger_handler import get_logger
+
+THUMBNAIL_SIZE = QSize(72, 100)
+MEMORY_CACHE_SIZE = 512  # 内存中缓存的缩略图数量
+DISK_CACHE_SIZE = 20000  # 磁盘中缓存的缩略图数量上限
+CACHE_DIR_NAME = "kk_thumbnail_cache"
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def get_thumbnail_cache_path(cache_dir, card_path):
+    """磁盘缓存文件路径 <路径哈希>-<修改时间和大小哈希>.jpg，卡片被修改后后半段随之变化"""
+    stat = os.stat(card_path)
+    version = _sha1(f"{stat.st_mtime_ns}|{stat.st_size}")[:16]
+    return os.path.join(cache_dir, f"{_sha1(os.path.abspath(card_path))}-{version}.jpg")
+
+
+def remove_stale_thumbnails(cache_path):
+    """删除同一卡片修改前的缩略图"""
+    prefix = os.path.basename(cache_path).split("-")[0]
+    for path in glob.glob(os.path.join(os.path.dirname(cache_path), glob.escape(prefix) + "-*.jpg")):
+        if path != cache_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def prune_disk_cache(cache_dir, max_files=DISK_CACHE_SIZE):
+    """缩略图数量超过上限时删除最久未使用的（命中时会更新修改时间）"""
+    try:
+        with os.scandir(cache_dir) as it:
+            entries = [(e.stat().st_mtime_ns, e.path) for e in it if e.name.endswith(".jpg") and e.is_file()]
+    except OSError as e:
+        get_logger().info("缩略图缓存清理失败 %s: %s", cache_dir, e)
+        return
+    if len(entries) <= max_files:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - max_files]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _ThumbnailSignals(QObject):
+    finished = Signal(str, QImage, object)  # (卡片路径, 缩略图, 卡片修改时间)
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中读取磁盘缓存，未命中时缩放解码原图并写入磁盘缓存"""
+
+    def __init__(self, card_path, cache_dir, signals):
+        super().__init__()
+        self.card_path = card_path
+        self.cache_dir = cache_dir
+        self.signals = signals
+        # 由 ThumbnailCache 持有，任务结束前可以安全地从队列中撤回
+        self.setAutoDelete(False)
+
+    def run(self):
+        image = QImage()
+        mtime = None
+        try:
+            mtime = os.stat(self.card_path).st_mtime_ns
+            cache_path = get_thumbnail_cache_path(self.cache_dir, self.card_path)
+            if os.path.exists(cache_path):
+                image = QImage(cache_path)
+                if not image.isNull():
+                    # 记录最近使用时间，清理时保留
+                    os.utime(cache_path)
+            if image.isNull():
+                reader = QImageReader(self.card_path)
+                # png 仍会按原尺寸解码后再缩小，但只有缩小后的图片离开后台线程并写入磁盘缓存
+                reader.setScaledSize(reader.size().scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio))
+                image = reader.read()
+                if not image.isNull():
+                    image.save(cache_path, "JPG", 85)
+                    remove_stale_thumbnails(cache_path)
+        except OSError as e:
+            get_logger().info("缩略图生成失败 %s: %s", self.card_path, e)
+        self.signals.finished.emit(self.card_path, image, mtime)
+
+
+class _PruneTask(QRunnable):
+    def __init__(self, cache_dir):
+        super().__init__()
+        self.cache_dir = cache_dir
+
+    def run(self):
+        prune_disk_cache(self.cache_dir)
+
+
+class ThumbnailCache(QObject):
+    """
+    缩略图缓存，request 命中内存缓存时直接返回，否则后台加载并通过 thumbnail_ready 信号通知
+    """
+    thumbnail_ready = Signal(str, QPixmap)
+
+    def __init__(self, cache_dir=None, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir or os.path.join(os.getcwd(), CACHE_DIR_NAME)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.memory_cache = OrderedDict()  # 卡片路径 -> QPixmap
+        self.pending = {}  # 卡片路径 -> 排队或执行中的任务
+        self.failed = {}  # 无法解码的卡片路径 -> 修改时间，卡片未修改前不再重试
+        self.thread_pool = QThreadPool(self)
+        self.signals = _ThumbnailSignals()
+        self.signals.finished.connect(self._on_finished)
+        # 清理使用单独的线程池，不会被 cancel_pending 丢弃
+        self.prune_pool = QThreadPool(self)
+        self.prune_pool.setMaxThreadCount(1)
+        self.prune_pool.start(_PruneTask(self.cache_dir))
+
+    def request(self, card_path):
+        pixmap = self.memory_cache.get(card_path)
+        if pixmap is not None:
+            self.memory_cache.move_to_end(card_path)
+            return pixmap
+        if card_path in self.failed:
+            try:
+                if os.stat(card_path).st_mtime_ns == self.failed[card_path]:
+                    return None
+            except OSError:
+                return None
+            del self.failed[card_path]
+        if card_path not in self.pending:
+            task = _ThumbnailTask(card_path, self.cache_dir, self.signals)
+            self.pending[card_path] = task
+            self.thread_pool.start(task)
+        return None
+
+    def cancel_pending(self):
+        """撤回还未开始的任务，快速滚动时丢弃已不可见的行，执行中的任务保留到完成"""
+        for card_path, task in list(self.pending.items()):
+            if self.thread_pool.tryTake(task):
+                del self.pending[card_path]
+
+    def _on_finished(self, card_path, image, mtime):
+        self.pending.pop(card_path, None)
+        if image.isNull():
+            self.failed[card_path] = mtime
+            return
+        # QPixmap 只能在界面线程创建
+        pixmap = QPixmap.fromImage(image)
+        self.memory_cache[card_path] = pixmap
+        if len(self.memory_cache) > MEMORY_CACHE_SIZE:
+            self.memory_cache.popitem(last=False)
+        self.thumbnail_ready.emit(card_path, pixmap)